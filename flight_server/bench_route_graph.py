@@ -0,0 +1,72 @@
+"""
+Benchmark of the itinerary search on a synthetic schedule, no database needed.
+
+    python bench_route_graph.py --flights 100000 --searches 1000
+"""
+import argparse, random, statistics, time
+from datetime import datetime, timedelta
+from route_graph import Leg, RouteGraph
+
+CITIES = [
+    "New York", "London", "Tokyo", "Sydney", "Dubai", "Los Angeles", "Hong Kong", "Chicago", "Madrid", "Seoul", "Paris", "Berlin", "Mumbai", "Toronto", "Singapore", "Rome", "Beijing", "Bangkok", "Mexico City", "Cape Town", "Cairo", "Moscow", "Istanbul", "Vienna", "Athens", "Lisbon", "Amsterdam", "Brussels", "Oslo", "Stockholm", "Helsinki", "Warsaw", ]
+
+
+def schedule(num_flights: int, days: int, rng: random.Random) -> list[Leg]:
+    """Random flights between random city pairs, spread over `days` like seed_database does."""
+    start = datetime.now().replace(microsecond=0)
+    legs = []
+    for i in range(num_flights):
+        from_city = rng.choice(CITIES)
+        to_city = rng.choice([c for c in CITIES if c != from_city])
+        departing_time = start + timedelta(minutes=rng.randint(0, days * 24 * 60))
+        arrival_time = departing_time + timedelta(hours=rng.randint(1, 24) + rng.random())
+        legs.append(Leg(departing_time, arrival_time, f"FL{i:07d}", from_city, to_city))
+    return legs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark connecting-flight searches on a synthetic schedule.")
+    parser.add_argument("--flights", type=int, default=100_000)
+    parser.add_argument("--days", type=int, default=30, help="Days the schedule is spread over.")
+    parser.add_argument("--searches", type=int, default=1000)
+    parser.add_argument("--max-legs", type=int, default=3)
+    parser.add_argument("--limit", type=int, default=5, help="Itineraries per search.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    legs = schedule(args.flights, args.days, rng)
+    graph = RouteGraph()
+    started = time.perf_counter()
+    graph.add_all(legs)
+    print(f"Built graph of {len(graph)} flights in {time.perf_counter() - started:.2f}s")
+
+    started = time.perf_counter()
+    for leg in legs[:1000]:
+        graph.remove(leg.flight_number)
+        graph.add(leg)
+    print(f"Incremental remove + add: {(time.perf_counter() - started) * 1000:.3f}ms per 1000 flights")
+
+    timings, found, connections = [], 0, []
+    first_day = min(leg.departing_time for leg in legs)
+    for _ in range(args.searches):
+        from_city, to_city = rng.sample(CITIES, 2)
+        departing_after = first_day + timedelta(hours=rng.randint(0, (args.days - 2) * 24))
+        started = time.perf_counter()
+        itineraries = graph.itineraries(
+            from_city, to_city, departing_after, departing_after + timedelta(days=1),
+            max_legs=args.max_legs, limit=args.limit,
+        )
+        timings.append((time.perf_counter() - started) * 1000)
+        found += bool(itineraries)
+        connections += [len(itinerary) - 1 for itinerary in itineraries]
+
+    percentiles = statistics.quantiles(timings, n=100, method="inclusive")
+    p50, p95, p99 = percentiles[49], percentiles[94], percentiles[98]
+    print(f"{args.searches} searches: p50 {p50:.2f}ms  p95 {p95:.2f}ms  p99 {p99:.2f}ms  max {max(timings):.2f}ms")
+    print(f"{found / args.searches:.0%} of searches found an itinerary, "
+          f"{statistics.mean(connections) if connections else 0:.2f} connections on average")
+
+
+if __name__ == "__main__":
+    main()
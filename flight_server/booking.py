@@ -1,116 +1,175 @@
-from fastapi import Depends, APIRouter, HTTPException, Query
-from sqlalchemy.orm import Session
-from database import SessionLocal, Flight, Booking
-import random
-from typing import Annotated, Optional
+from fastapi import Depends, APIRouter, HTTPException, Query, Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
+from sqlalchemy import delete, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import SEAT_LETTERS, get_db, available_seats, seat_map, Flight, Booking, Seat
+from seat_map import SeatMap
+from response_cache import response_cache
+import secrets
+from typing import Annotated, List, Literal, Optional
+from utils import MAX_PAGE_SIZE, PAGE_SIZE, booking_rows, format_bookings_data, format_time, keyset, next_page, stream_ndjson
+import os
 import json
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 #### BOOKING API #################################################################################
 
 booking_router = APIRouter(prefix="/bookings", tags=["bookings"])
 
+# Crockford base32 without I, L, O and U, so confirmation numbers survive being read out loud
+CONFIRMATION_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+CONFIRMATION_LENGTH = 8  # 32^8, about 10^12 numbers
+CONFIRMATION_ATTEMPTS = 5
+# older bookings were numbered CONF1000 to CONF9999
+CONFIRMATION_REGEX = f"^CONF([0-9]{{4}}|[{CONFIRMATION_ALPHABET}]{{{CONFIRMATION_LENGTH}}})$"
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", 5000))
+BULK_MAX_SEATS_PER_ITEM = int(os.getenv("BULK_MAX_SEATS_PER_ITEM", 40))
+BULK_CLAIM_ROUNDS = 3
+FLIGHT_NUMBER_REGEX = "FL[0-9]{4}"
+PASSENGER_NAME_REGEX = r"^([a-zA-Z]{2,}\s[a-zA-Z]{1,}'?-?[a-zA-Z]{2,}\s?([a-zA-Z]{1,})?)"
+
+
+def new_confirmation_number() -> str:
+    return "CONF" + "".join(secrets.choice(CONFIRMATION_ALPHABET) for _ in range(CONFIRMATION_LENGTH))
+
 
 # list all bookings
 @booking_router.get("/list")
 async def list_booking_by_confirmation_or_passenger(
+    response: Response,
     confirmation_number: str = None,
     passenger_name: str = None,
-    db: Session = Depends(get_db),
+    limit: Annotated[Optional[int], Query(ge=1, le=MAX_PAGE_SIZE, description=f"Page size, {PAGE_SIZE} by default; ndjson streams every row unless set")] = None,
+    cursor: Annotated[Optional[str], Query(description="X-Next-Cursor header of the previous page")] = None,
+    format: Literal["json", "ndjson"] = "json",
+    db: AsyncSession = Depends(get_db),
 ):
     if confirmation_number:
         bookings = [
-            db.query(Booking)
-            .filter(Booking.confirmation_number == confirmation_number)
-            .first()
-        ]  # Replace with await if needed
+            await db.scalar(select(Booking).filter(Booking.confirmation_number == confirmation_number))
+        ]
     elif passenger_name:
         bookings = [
-            db.query(Booking).filter(Booking.passenger_name == passenger_name).first()
-        ]  # Replace with await if needed
+            await db.scalar(select(Booking).filter(Booking.passenger_name == passenger_name))
+        ]
     else:
-        bookings = db.query(Booking).all()  # Replace with await if needed
-    return [
-        {
-            "flight_number": b.flight_number,
-            "passenger_name": b.passenger_name,
-            "seat_number": b.seat_number,
-            "confirmation_number": b.confirmation_number,
-        }
-        for b in bookings
-    ]
+        # every booking, a page at a time or streamed
+        keys = [Booking.id]
+        if format == "ndjson":
+            # a stream has no next page to detect, it stops at exactly `limit` rows
+            return stream_ndjson(keyset(select(Booking), keys, cursor, None).limit(limit), booking_rows)
+        limit = limit or PAGE_SIZE
+        bookings = (await db.scalars(keyset(select(Booking), keys, cursor, limit))).all()
+        bookings, next_cursor = next_page(bookings, keys, limit)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+    return format_bookings_data(bookings)
 
 
 # make new booking
 @booking_router.post("/book")
 async def book_flight(
-    flight_number: Annotated[str, Query(example="FL1234", regex="FL[0-9]{4}", max_length=6)],
-    passenger_name: Annotated[str, Query(example="Jon Doe", regex="^([a-zA-Z]{2,}\s[a-zA-Z]{1,}'?-?[a-zA-Z]{2,}\s?([a-zA-Z]{1,})?)", max_length=50)],
+    flight_number: Annotated[str, Query(example="FL1234", regex=FLIGHT_NUMBER_REGEX, max_length=6)],
+    passenger_name: Annotated[str, Query(example="Jon Doe", regex=PASSENGER_NAME_REGEX, max_length=50)],
     no_of_seats: Annotated[int, Query(example=1, ge=1, le=10)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    if flight_number not in [f.flight_number for f in db.query(Flight).all()]:
+    # one lookup on the unique flight_number index
+    flight_obj = await db.scalar(select(Flight).filter(Flight.flight_number == flight_number))
+    if flight_obj is None:
         raise HTTPException(status_code=404, detail=f"Flight {flight_number} not found")
-    
-    available_seats = db.query(Flight).filter(Flight.flight_number == flight_number).first().available_seats
-    
-    if not available_seats:
+
+    free_seats = await seat_map(db, flight_number)
+    if not free_seats:
         raise HTTPException(status_code=400, detail=f"No seats are available for flight {flight_number}")
-    
-    if no_of_seats > len(available_seats):
-        raise HTTPException(status_code=400, detail=f"Only {len(available_seats)} seats are available for flight {flight_number}")
-    
-    # Randomly select no_of_seats from available_seats
-    if no_of_seats == 1:
-        seat_numbers = [random.choice(available_seats)]
-    else:
-        # select continuous seats
-        seat_numbers = available_seats[:no_of_seats]
+    if no_of_seats > len(free_seats):
+        raise HTTPException(status_code=400, detail=f"Only {len(free_seats)} seats are available for flight {flight_number}")
+
+    # the unique index on confirmation_number rejects the rare collision, draw again instead of scanning
+    for attempt in range(CONFIRMATION_ATTEMPTS):
+        booking = Booking(
+            flight_number=flight_number,
+            passenger_name=passenger_name,
+            seat_numbers=[],
+            confirmation_number=new_confirmation_number(),
+        )
+        try:
+            async with db.begin_nested():
+                db.add(booking)
+        except IntegrityError:
+            if attempt == CONFIRMATION_ATTEMPTS - 1:
+                raise HTTPException(status_code=503, detail="Could not allocate a confirmation number, please retry")
+            continue
+        break
+
+    seat_numbers = await claim_seats(db, booking, free_seats, no_of_seats)
+    if seat_numbers is None:
+        raise HTTPException(status_code=400, detail=f"Not enough seats are left on flight {flight_number}, please retry")
+    booking.seat_numbers = seat_numbers
+    await db.commit()
+    response_cache.invalidate_flight(flight_number)
+    return booking
+
 
-    
+class _SeatsTaken(Exception):
+    pass
 
-    existing_confirmations = {
-        booking.confirmation_number
-        for booking in db.query(Booking.confirmation_number).all()
-    }  # Consider: await db.query(...)
 
+async def claim_seats(db: AsyncSession, booking: Booking, free_seats: SeatMap, n: int, near: int = None):
+    """
+    Give `booking` n seats sitting together, picked from the `free_seats` map.
+
+    The picked seats are locked with FOR UPDATE SKIP LOCKED; seats another booking
+    holds or is claiming right now are dropped from the map and the pick is retried,
+    so claims never wait on each other. None when the map runs out of seats.
+    """
     while True:
-        confirmation_number = "CONF" + str(random.randint(1000, 9999))
-        if confirmation_number not in existing_confirmations:
-            break
+        picked = free_seats.find_block(n, near)
+        if picked is None:
+            return None
+        try:
+            async with db.begin_nested():
+                seats = (await db.scalars(
+                    select(Seat)
+                    .filter(
+                        Seat.flight_number == booking.flight_number,
+                        Seat.seat_number.in_(picked),
+                        Seat.booking_id.is_(None),
+                    )
+                    .with_for_update(skip_locked=True)
+                )).all()
+                if len(seats) < n:
+                    # rolling back the savepoint also gives up the locks we did get
+                    raise _SeatsTaken({seat.seat_number for seat in seats})
+                for seat in seats:
+                    seat.booking_id = booking.id
+        except _SeatsTaken as e:
+            locked = e.args[0]
+            free_seats.take(seat_number for seat_number in picked if seat_number not in locked)
+            continue
+        free_seats.take(picked)
+        return sorted(picked, key=lambda seat_number: (free_seats.row_of(seat_number), seat_number))
 
-    booking = Booking(
-        flight_number=flight_number,
-        passenger_name=passenger_name,
-        seat_numbers=seat_numbers,
-        confirmation_number=confirmation_number,
+
+async def release_seats(db: AsyncSession, booking: Booking, seat_numbers: list[str]):
+    """Give seats held by `booking` back to its flight."""
+    await db.execute(
+        update(Seat)
+        .filter(Seat.booking_id == booking.id, Seat.seat_number.in_(seat_numbers))
+        .values(booking_id=None)
     )
-    
-    # Update flight record to remove the booked seat from available_seats
-    flight_obj = db.query(Flight).filter(Flight.flight_number == flight_number).first()
-    flight_obj.available_seats = sorted(list(set(available_seats).difference(set(seat_numbers))))
-  
-    db.add(booking)
-    db.commit()
-    db.refresh(booking)
-    db.refresh(flight_obj)
-    return booking
 
 
 # amend booking
 @booking_router.put("/amend")
 async def amend_booking_by_confirmation_number(
-    confirmation_number: Annotated[str, Query(example="CONF1234", regex="CONF[0-9]{4}", max_length=8)],
+    confirmation_number: Annotated[str, Query(example="CONF7K2M9QXA", regex=CONFIRMATION_REGEX, max_length=12)],
     no_of_seats: Optional[Annotated[int, Query(example=1, ge=1, le=10)]] = None,
     seat_number_from: Optional[Annotated[str, Query(description="Change seat from", example="12A", max_length=4)]] = None,
     seat_number_to: Optional[Annotated[str, Query(description="Change seat to", example="12B", max_length=4)]] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     # Validate that only one of (no_of_seats) or (seat_number_from and seat_number_to) is provided
     if no_of_seats is not None and (seat_number_from or seat_number_to):
@@ -124,100 +183,277 @@ async def amend_booking_by_confirmation_number(
             detail="Both seat_number_from and seat_number_to must be provided together"
         )
 
-    # check if booking exists
-    booking = (
-        db.query(Booking)
-        .filter(Booking.confirmation_number == confirmation_number)
-        .first()
+    # check if booking exists, and hold it so amendments of one booking apply one after another
+    booking = await db.scalar(
+        select(Booking).filter(Booking.confirmation_number == confirmation_number).with_for_update()
     )
     if not booking:
         raise HTTPException(status_code=404, detail=f"Booking {confirmation_number} not found")
-    
-    flight = db.query(Flight).filter(Flight.flight_number == booking.flight_number).first()
-    if not flight:
-        raise HTTPException(status_code=404, detail=f"Flight {booking.flight_number} not found")
-    
-    available_seats = list(flight.available_seats)
+
     booked_seats = list(booking.seat_numbers)
-    # print(f"available_seats: {available_seats}")
-    # print(f"booked_seats: {booked_seats}")
-    # print("--------------------")
+    free_seat = (Seat.flight_number == booking.flight_number, Seat.booking_id.is_(None))
     # Handle seat_number_from and seat_number_to update
     if seat_number_from and seat_number_to:
         if seat_number_from not in booked_seats:
             raise HTTPException(status_code=400, detail=f"Seat {seat_number_from} is not in the booked seats")
-        if seat_number_to not in available_seats:
-            raise HTTPException(status_code=400, detail=f"Seat {seat_number_to} is not available. Available seats are {available_seats}")
-        
-        
-        # move seat_number_from from booked_seats to available_seats
+
+        # claim the new seat only if it is still free, whoever updates it first gets it
+        claimed = await db.execute(
+            update(Seat)
+            .filter(*free_seat, Seat.seat_number == seat_number_to)
+            .values(booking_id=booking.id)
+        )
+        if claimed.rowcount != 1:
+            available = (await available_seats(db, [booking.flight_number]))[booking.flight_number]
+            raise HTTPException(status_code=400, detail=f"Seat {seat_number_to} is not available. Available seats are {available}")
+
+        await release_seats(db, booking, [seat_number_from])
         booked_seats.remove(seat_number_from)
-        # print(f"booked_seats: {booked_seats} after removing {seat_number_from}")
-        available_seats.append(seat_number_from)
-        # print(f"available_seats: {available_seats} after adding {seat_number_from}")
-        # print("--------------------")
-        
-        # move seat_number_to from available_seats to booked_seats
-        available_seats.remove(seat_number_to)
-        # print(f"available_seats: {available_seats} after removing {seat_number_to}")
         booked_seats.append(seat_number_to)
-        # print(f"booked_seats: {booked_seats} after adding {seat_number_to}")
-        # print("--------------------")
-        
-        flight.available_seats = sorted(list(set(available_seats)))
-        booking.seat_numbers = sorted(list(set(booked_seats)))
-        
-        db.commit()
-        db.refresh(flight)
-        db.refresh(booking)
-        
+        booking.seat_numbers = sorted(booked_seats)
+
+        await db.commit()
+        response_cache.invalidate_flight(booking.flight_number)
         return booking
 
     # Handle no_of_seats update
     if no_of_seats is not None:
         if no_of_seats < len(booked_seats):
             # Reduce seats
-            seats_to_release = booked_seats[no_of_seats:]
+            await release_seats(db, booking, booked_seats[no_of_seats:])
             booking.seat_numbers = booked_seats[:no_of_seats]
-            flight.available_seats = sorted(available_seats + seats_to_release)
         elif no_of_seats > len(booked_seats):
             # Add seats
             additional_seats_needed = no_of_seats - len(booked_seats)
-            if additional_seats_needed > len(available_seats):
+            free_seats = await seat_map(db, booking.flight_number)
+            # sit the new seats next to the booked ones where possible
+            near = free_seats.row_of(booked_seats[0]) if booked_seats else None
+            new_seats = await claim_seats(db, booking, free_seats, additional_seats_needed, near)
+            if new_seats is None:
                 raise HTTPException(
                     status_code=400,
-                    detail=f"Only {len(available_seats)} additional seats are available"
+                    detail=f"Only {len(free_seats)} additional seats are available"
                 )
-            new_seats = available_seats[:additional_seats_needed]
-            booking.seat_numbers = sorted(list(set(booked_seats + new_seats)))
-            flight.available_seats = sorted(list(set(available_seats).difference(set(new_seats))))
-        
-        db.commit()
-        db.refresh(booking)
-        db.refresh(flight)
+            booking.seat_numbers = booked_seats + new_seats
+
+        await db.commit()
+        response_cache.invalidate_flight(booking.flight_number)
         return booking
 
     raise HTTPException(status_code=400, detail="Either no_of_seats or both seat_number_from and seat_number_to must be provided")
 
 
+class BulkBookingItem(BaseModel):
+    flight_number: Annotated[str, Field(examples=["FL1234"], pattern=FLIGHT_NUMBER_REGEX, max_length=6)]
+    passenger_name: Annotated[str, Field(examples=["Jon Doe"], pattern=PASSENGER_NAME_REGEX, max_length=50)]
+    no_of_seats: Annotated[int, Field(ge=1, le=BULK_MAX_SEATS_PER_ITEM)] = 1
+
+
+class BulkBookingRequest(BaseModel):
+    mode: Literal["all_or_nothing", "best_effort"] = "all_or_nothing"
+    items: Annotated[List[BulkBookingItem], Field(min_length=1, max_length=BULK_MAX_ITEMS)]
+
+
+# takes the picked seats that are still free; seats another transaction is claiming are skipped
+# rather than waited for, and only the seats picked are locked
+CLAIM_SEATS = text(
+    "WITH free AS ("
+    " SELECT id FROM seats WHERE id = ANY(CAST(:ids AS integer[])) AND booking_id IS NULL"
+    " ORDER BY id FOR UPDATE SKIP LOCKED"
+    ")"
+    " UPDATE seats SET booking_id = claimed.booking_id"
+    " FROM unnest(CAST(:ids AS integer[]), CAST(:owners AS integer[])) AS claimed(id, booking_id)"
+    " WHERE seats.id = claimed.id AND seats.booking_id IS NULL AND seats.id IN (SELECT id FROM free)"
+    " RETURNING seats.id"
+)
+
+
+# book many passengers at once
+@booking_router.post("/bulk")
+async def bulk_book(request: BulkBookingRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Book every item in one transaction, with a fixed number of statements per round whatever the item count.
+
+    Free seats are read without locking and handed out in memory, in item order, seats of one
+    item together. Bookings are inserted in one batch, then the picked seats are claimed in one
+    conditional UPDATE that only takes seats still free. Items that lost a seat to a concurrent
+    booking give back the rest and are planned again, up to BULK_CLAIM_ROUNDS times, so single
+    bookings on the same flights carry on while a bulk job runs. With all_or_nothing nothing is
+    booked unless every item can be (409 otherwise); best_effort books the items that fit.
+    Every item gets a result, in request order.
+    """
+    items = request.items
+    results = [
+        {"index": i, "flight_number": item.flight_number, "passenger_name": item.passenger_name, "status": "pending"}
+        for i, item in enumerate(items)
+    ]
+    flight_numbers = list({item.flight_number for item in items})
+    known_flights = set((await db.scalars(select(Flight.flight_number).filter(Flight.flight_number.in_(flight_numbers)))).all())
+    for item, result in zip(items, results):
+        if item.flight_number not in known_flights:
+            result.update(status="failed", error=f"Flight {item.flight_number} not found")
+
+    planned, seat_ids = await _plan_bulk_seats(db, items, results, [i for i, result in enumerate(results) if result["status"] == "pending"])
+    if request.mode == "all_or_nothing" and len(planned) < len(items):
+        return await _bulk_conflict(db, request, results)
+
+    booking_ids = await _insert_bulk_bookings(db, items, results, planned)
+
+    for claim_round in range(BULK_CLAIM_ROUNDS):
+        if not planned:
+            break
+        ids, owners = [], []
+        for i, seat_numbers in planned.items():
+            for seat_number in seat_numbers:
+                ids.append(seat_ids[(items[i].flight_number, seat_number)])
+                owners.append(booking_ids[i])
+        claimed = set((await db.scalars(CLAIM_SEATS, {"ids": ids, "owners": owners})).all())
+        lost = [
+            i for i, seat_numbers in planned.items()
+            if any(seat_ids[(items[i].flight_number, seat_number)] not in claimed for seat_number in seat_numbers)
+        ]
+        for i, seat_numbers in planned.items():
+            if i not in lost:
+                results[i].update(status="booked", seat_numbers=seat_numbers)
+        if not lost:
+            break
+        # the seats these items did get go back, they are picked again as a block
+        await db.execute(
+            update(Seat).filter(Seat.booking_id.in_([booking_ids[i] for i in lost])).values(booking_id=None)
+        )
+        if claim_round == BULK_CLAIM_ROUNDS - 1:
+            for i in lost:
+                results[i].update(status="failed", error=f"Not enough seats are left on flight {items[i].flight_number}, please retry")
+            break
+        planned, seat_ids = await _plan_bulk_seats(db, items, results, lost)
+        if request.mode == "all_or_nothing" and len(planned) < len(lost):
+            return await _bulk_conflict(db, request, results)
+        if planned:
+            await db.execute(update(Booking), [{"id": booking_ids[i], "seat_numbers": seat_numbers} for i, seat_numbers in planned.items()])
+
+    failed = [i for i, result in enumerate(results) if result["status"] != "booked"]
+    if failed and request.mode == "all_or_nothing":
+        return await _bulk_conflict(db, request, results)
+    unbooked = [booking_ids[i] for i in failed if i in booking_ids]
+    if unbooked:
+        await db.execute(delete(Booking).filter(Booking.id.in_(unbooked)))
+    for i in failed:
+        results[i].pop("confirmation_number", None)
+    await db.commit()
+    for flight_number in {result["flight_number"] for result in results if result["status"] == "booked"}:
+        response_cache.invalidate_flight(flight_number)
+    return {"mode": request.mode, "booked": len(items) - len(failed), "failed": len(failed), "results": results}
+
+
+async def _plan_bulk_seats(db: AsyncSession, items: List[BulkBookingItem], results: List[dict], indexes: List[int]):
+    """
+    Pick seats for the items at `indexes` from the free seats of their flights, read without locking.
+
+    Returns the seat numbers picked per item index and the ids of the free seats; items
+    that do not fit are marked failed.
+    """
+    flight_numbers = list({items[i].flight_number for i in indexes})
+    rows = (await db.execute(
+        select(Seat.id, Seat.flight_number, Seat.seat_number)
+        .filter(Seat.flight_number.in_(flight_numbers), Seat.booking_id.is_(None))
+    )).all()
+    seat_maps = {flight_number: SeatMap(SEAT_LETTERS) for flight_number in flight_numbers}
+    seat_ids = {}
+    for seat_id, flight_number, seat_number in rows:
+        seat_maps[flight_number].release([seat_number])
+        seat_ids[(flight_number, seat_number)] = seat_id
+
+    planned = {}
+    for i in indexes:
+        free_seats = seat_maps[items[i].flight_number]
+        seat_numbers = free_seats.find_block(items[i].no_of_seats)
+        if seat_numbers is None:
+            results[i].update(status="failed", error=f"Only {len(free_seats)} seats are available for flight {items[i].flight_number}")
+            continue
+        free_seats.take(seat_numbers)
+        planned[i] = seat_numbers
+    return planned, seat_ids
+
+
+async def _insert_bulk_bookings(db: AsyncSession, items: List[BulkBookingItem], results: List[dict], planned: dict) -> dict:
+    """
+    Insert the bookings of the planned items in one INSERT and return their ids per item index.
+
+    A confirmation number already taken skips its row, which gets a new number in the next
+    round; numbers are never drawn twice within the batch.
+    """
+    booking_ids = {}
+    drawn = set()
+    pending = list(planned)
+    for _ in range(CONFIRMATION_ATTEMPTS):
+        if not pending:
+            break
+        numbered = {}  # item index -> confirmation number
+        for i in pending:
+            confirmation_number = new_confirmation_number()
+            while confirmation_number in drawn:
+                confirmation_number = new_confirmation_number()
+            drawn.add(confirmation_number)
+            numbered[i] = confirmation_number
+        inserted = await db.execute(
+            pg_insert(Booking)
+            .on_conflict_do_nothing(index_elements=[Booking.confirmation_number])
+            .returning(Booking.id, Booking.confirmation_number),
+            [
+                {
+                    "flight_number": items[i].flight_number,
+                    "passenger_name": items[i].passenger_name,
+                    "seat_numbers": planned[i],
+                    "confirmation_number": confirmation_number,
+                }
+                for i, confirmation_number in numbered.items()
+            ],
+        )
+        items_by_number = {confirmation_number: i for i, confirmation_number in numbered.items()}
+        for booking_id, confirmation_number in inserted:
+            i = items_by_number[confirmation_number]
+            booking_ids[i] = booking_id
+            results[i]["confirmation_number"] = confirmation_number
+        pending = [i for i in pending if i not in booking_ids]
+    if pending:
+        await db.rollback()
+        raise HTTPException(status_code=503, detail="Could not allocate confirmation numbers, please retry")
+    return booking_ids
+
+
+async def _bulk_conflict(db: AsyncSession, request: BulkBookingRequest, results: List[dict]) -> JSONResponse:
+    """all_or_nothing answer when an item could not be booked: nothing is kept."""
+    await db.rollback()
+    for result in results:
+        if result["status"] != "failed":
+            result["status"] = "not_booked"
+        for key in ("confirmation_number", "seat_numbers"):
+            result.pop(key, None)
+    failed = sum(result["status"] == "failed" for result in results)
+    return JSONResponse(
+        status_code=409,
+        content={"mode": request.mode, "booked": 0, "failed": failed, "results": results},
+    )
+
+
 # search all bookings for a flight
 @booking_router.get("/search")
-async def search_booking_by_flight(flight_number: str, db: Session = Depends(get_db)):
-    bookings = db.query(Booking).filter(Booking.flight_number == flight_number).all()
-    flight = db.query(Flight).filter(Flight.flight_number == flight_number).first()
+async def search_booking_by_flight(flight_number: str, db: AsyncSession = Depends(get_db)):
+    bookings = (await db.scalars(select(Booking).filter(Booking.flight_number == flight_number))).all()
+    flight = (await db.scalars(select(Flight).filter(Flight.flight_number == flight_number))).first()
 
     return [
         {
             "flight_number": flight.flight_number,
             "departure_city": flight.from_city,
             "arrival_city": flight.to_city,
-            "departing_time": flight.departing_time,
-            "arrival_time": flight.arrival_time,
+            "departing_time": format_time(flight.departing_time),
+            "arrival_time": format_time(flight.arrival_time),
             "flight_duration": flight.flight_duration,
             "bookings": [
                 {
                     "passenger_name": b.passenger_name,
-                    "seat_number": b.seat_number,
+                    "seat_numbers": b.seat_numbers,
                     "confirmation_number": b.confirmation_number,
                 }
                 for b in bookings
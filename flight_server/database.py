@@ -1,96 +1,242 @@
-from sqlalchemy import create_engine, Column, Integer, String, Double
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, Double, UniqueConstraint, exists, func, insert, inspect, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base
 from sqlalchemy.types import ARRAY
+from seat_map import SeatMap
 import random
 from datetime import datetime, timedelta
-import argparse, os
+import argparse, asyncio, os
 
 
-SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
+def async_database_url(url: str) -> str:
+    """Point a postgresql URL at the asyncpg driver, whatever driver it named."""
+    scheme, rest = url.split("://", 1)
+    if scheme.split("+")[0] in ("postgresql", "postgres"):
+        scheme = "postgresql+asyncpg"
+    return f"{scheme}://{rest}"
+
+
+SQLALCHEMY_DATABASE_URL = async_database_url(os.getenv("DATABASE_URL"))
 print(SQLALCHEMY_DATABASE_URL)
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL
+# Pool sized for concurrent requests; every setting can be tuned from the environment
+engine = create_async_engine(
+    SQLALCHEMY_DATABASE_URL,
+    pool_size=int(os.getenv("DB_POOL_SIZE", 10)),
+    max_overflow=int(os.getenv("DB_MAX_OVERFLOW", 20)),
+    pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", 30)),
+    pool_recycle=int(os.getenv("DB_POOL_RECYCLE", 1800)),
+    pool_pre_ping=os.getenv("DB_POOL_PRE_PING", "True").lower() == "true",
+    connect_args={
+        # enforced by postgres for every statement of the connection
+        "server_settings": {"statement_timeout": os.getenv("DB_STATEMENT_TIMEOUT_MS", "5000")},
+        # client side limit for a single query, in seconds
+        "command_timeout": float(os.getenv("DB_COMMAND_TIMEOUT", 10)),
+    },
 )
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# objects stay readable after commit, an expired attribute would need a lazy load outside the loop
+SessionLocal = async_sessionmaker(engine, expire_on_commit=False)
 
 Base = declarative_base()
 
+
+async def get_db():
+    async with SessionLocal() as db:
+        yield db
+
+
 class Flight(Base):
     __tablename__ = "flights"
+    __table_args__ = (
+        # route searches filter on both cities and a departure window and page in
+        # (departing_time, id) order, all of it one range scan of this index
+        Index("ix_flights_route_departure", "from_city", "to_city", "departing_time", "id"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     flight_number = Column(String, unique=True, index=True)
-    from_city = Column(String, index=True)
+    from_city = Column(String)  # leading column of ix_flights_route_departure
     to_city = Column(String, index=True)
-    departing_time = Column(String)
+    departing_time = Column(DateTime, index=True)
     flight_duration = Column(Double)
-    arrival_time = Column(String)
-    available_seats = Column(ARRAY(String))  # comma-separated list of seats
+    arrival_time = Column(DateTime)
 
 class Booking(Base):
     __tablename__ = "bookings"
     id = Column(Integer, primary_key=True, index=True)
     flight_number = Column(String, index=True)
-    passenger_name = Column(String)
+    passenger_name = Column(String, index=True)
     seat_numbers = Column(ARRAY(String))
-    confirmation_number = Column(String)
-    
-# Create all tables based on the defined models
-Base.metadata.create_all(engine)
+    confirmation_number = Column(String, unique=True, index=True)
 
-def seed_database(num_flights=10):
+class Seat(Base):
+    """
+    One row per seat of a flight, free while booking_id is NULL.
+
+    Bookings claim seats row by row (SELECT ... FOR UPDATE SKIP LOCKED or a conditional
+    UPDATE), so concurrent bookings on one flight never wait on or overwrite each other.
+    """
+    __tablename__ = "seats"
+    __table_args__ = (
+        UniqueConstraint("flight_number", "seat_number"),
+        # the free seats of a flight, what every booking searches
+        Index("ix_seats_free", "flight_number", "seat_number", postgresql_where=text("booking_id IS NULL")),
+    )
+    id = Column(Integer, primary_key=True)
+    flight_number = Column(String, ForeignKey("flights.flight_number"), nullable=False)
+    seat_number = Column(String, nullable=False)
+    booking_id = Column(Integer, ForeignKey("bookings.id"), index=True)
+
+
+# rows 10-19, seats A-D
+SEAT_ROWS = range(10, 20)
+SEAT_LETTERS = "ABCD"
+SEAT_LAYOUT = [f"{seat}{row}" for row in SEAT_ROWS for seat in SEAT_LETTERS]
+
+
+async def available_seats(db: AsyncSession, flight_numbers: list[str]) -> dict[str, list[str]]:
+    """Free seats of the given flights in row order, in one query."""
+    seat_maps = {flight_number: SeatMap(SEAT_LETTERS) for flight_number in flight_numbers}
+    if seat_maps:
+        rows = await db.execute(
+            select(Seat.flight_number, Seat.seat_number)
+            .filter(Seat.flight_number.in_(seat_maps), Seat.booking_id.is_(None))
+        )
+        for flight_number, seat_number in rows:
+            seat_maps[flight_number].release([seat_number])
+    return {flight_number: seat_map.to_list() for flight_number, seat_map in seat_maps.items()}
+
+
+async def free_seat_counts(db: AsyncSession, flight_numbers: list[str]) -> dict[str, int]:
+    """Number of free seats of the given flights, flights without any are left out."""
+    if not flight_numbers:
+        return {}
+    rows = await db.execute(
+        select(Seat.flight_number, func.count())
+        .filter(Seat.flight_number.in_(flight_numbers), Seat.booking_id.is_(None))
+        .group_by(Seat.flight_number)
+    )
+    return dict(rows.all())
+
+
+async def seat_map(db: AsyncSession, flight_number: str) -> SeatMap:
+    """Free seats of one flight as a SeatMap, read without locking."""
+    free = await db.scalars(
+        select(Seat.seat_number).filter(Seat.flight_number == flight_number, Seat.booking_id.is_(None))
+    )
+    return SeatMap.from_seats(free, SEAT_LETTERS)
+
+
+async def init_db(num_flights=200):
+    """Create all tables based on the defined models and make sure there are flights to search."""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(migrate_flight_times)
+        # create_all skips tables that already exist, add indexes introduced since they were created
+        await conn.run_sync(create_missing_indexes)
+    await seed_database(num_flights)
+    await backfill_seats()
+
+
+def migrate_flight_times(conn):
+    """Convert departure and arrival times stored as text by earlier versions to timestamps."""
+    columns = {column["name"]: column["type"] for column in inspect(conn).get_columns("flights")}
+    for name in ("departing_time", "arrival_time"):
+        if isinstance(columns.get(name), String):
+            conn.execute(text(f"ALTER TABLE flights ALTER COLUMN {name} TYPE timestamp USING {name}::timestamp"))
+            print(f"Converted flights.{name} to timestamp")
+
+
+def create_missing_indexes(conn):
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+async def seed_database(num_flights=10):
     """
     Populates the flight database with random flight information.
     """
-    session = SessionLocal()
     cities = [
         "New York", "London", "Tokyo", "Sydney", "Dubai", "Los Angeles", "Hong Kong", "Chicago", "Madrid", "Seoul", "Paris", "Berlin", "Mumbai", "Toronto", "Singapore", "Rome", "Beijing", "Bangkok", "Mexico City", "Cape Town", "Cairo", "Moscow", "Istanbul", "Vienna", "Athens", "Lisbon", "Amsterdam", "Brussels", "Oslo", "Stockholm", "Helsinki", "Warsaw", ]
-    existing_flight_numbers = {flight.flight_number for flight in session.query(Flight.flight_number).all()}  # Fetch all existing flight numbers
-    
-    if len(existing_flight_numbers) >= num_flights:
-        print("Database already has enough flights.")
-        return
-    
-    added = 0
-    flights_to_add = []
-    
-    while added < num_flights:
-        flight_number = "FL" + str(random.randint(1000, 9999))
-        if flight_number in existing_flight_numbers:
-            continue
-
-        from_city = random.choice(cities)
-        to_city = random.choice([c for c in cities if c != from_city])
-        start_time = (datetime.now() + timedelta(hours=random.randint(1, 72)))
-        departing_time = start_time.strftime("%Y-%m-%d %H:%M:%S")
-        flight_duration = random.randint(1, 24) + random.random()
-        arrival_time = (start_time + timedelta(hours=flight_duration)).strftime("%Y-%m-%d %H:%M:%S")
-        # Generate a comma-separated list of 12 available seats (rows 1-3, seats A-D)
-        available_seats = [f"{seat}{row}" for row in range(10,20) for seat in "ABCD"]
-        flight = Flight(
-            flight_number=flight_number,
-            from_city=from_city,
-            to_city=to_city,
-            departing_time=departing_time,
-            available_seats=sorted(available_seats),
-            flight_duration=flight_duration,
-            arrival_time=arrival_time
+    async with SessionLocal() as session:
+        existing_flight_numbers = set((await session.scalars(select(Flight.flight_number))).all())  # Fetch all existing flight numbers
+
+        if len(existing_flight_numbers) >= num_flights:
+            print("Database already has enough flights.")
+            return
+
+        added = 0
+        flights_to_add = []
+
+        while added < num_flights:
+            flight_number = "FL" + str(random.randint(1000, 9999))
+            if flight_number in existing_flight_numbers:
+                continue
+
+            from_city = random.choice(cities)
+            to_city = random.choice([c for c in cities if c != from_city])
+            departing_time = (datetime.now() + timedelta(hours=random.randint(1, 72))).replace(microsecond=0)
+            flight_duration = random.randint(1, 24) + random.random()
+            arrival_time = (departing_time + timedelta(hours=flight_duration)).replace(microsecond=0)
+            flight = Flight(
+                flight_number=flight_number,
+                from_city=from_city,
+                to_city=to_city,
+                departing_time=departing_time,
+                flight_duration=flight_duration,
+                arrival_time=arrival_time
+            )
+            flights_to_add.append(flight)
+            existing_flight_numbers.add(flight_number)  # Ensure no duplicates in future iterations
+            added += 1
+
+        session.add_all(flights_to_add)
+        await session.flush()
+        await session.execute(
+            insert(Seat),
+            [
+                {"flight_number": flight.flight_number, "seat_number": seat_number}
+                for flight in flights_to_add
+                for seat_number in SEAT_LAYOUT
+            ],
         )
-        flights_to_add.append(flight)
-        existing_flight_numbers.add(flight_number)  # Ensure no duplicates in future iterations
-        added += 1
+        await session.commit()
 
-    session.bulk_save_objects(flights_to_add)  # Efficient bulk insert
-    session.commit()
-    session.close()
 
+async def backfill_seats():
+    """
+    Create the seat rows of flights stored before the seats table existed.
 
+    Seats listed in a booking of the flight are attached to that booking, the rest are free.
+    """
+    async with SessionLocal() as session:
+        flight_numbers = (await session.scalars(
+            select(Flight.flight_number).filter(~exists().where(Seat.flight_number == Flight.flight_number))
+        )).all()
+        if not flight_numbers:
+            return
+        holders = {}
+        for booking in (await session.scalars(select(Booking).filter(Booking.flight_number.in_(flight_numbers)))).all():
+            for seat_number in booking.seat_numbers or []:
+                holders[(booking.flight_number, seat_number)] = booking.id
+        await session.execute(
+            insert(Seat),
+            [
+                {
+                    "flight_number": flight_number,
+                    "seat_number": seat_number,
+                    "booking_id": holders.get((flight_number, seat_number)),
+                }
+                for flight_number in flight_numbers
+                for seat_number in SEAT_LAYOUT
+            ],
+        )
+        await session.commit()
+        print(f"Created seats for {len(flight_numbers)} flights")
 
-seed_database(200)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Seed flight database with random flights.")
     parser.add_argument("--num_flights", type=int, default=10, help="Number of flights to add.")
     args = parser.parse_args()
-    seed_database(args.num_flights)
\ No newline at end of file
+    asyncio.run(init_db(args.num_flights))
@@ -1,15 +1,19 @@
 
-from fastapi import Depends, APIRouter
-from sqlalchemy.orm import Session
-from database import SessionLocal, Flight
-from utils import format_flights_data
+from fastapi import Depends, APIRouter, HTTPException, Query, Response
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import SessionLocal, get_db, free_seat_counts, Flight
+from route_graph import Leg, route_graph
+from typing import Annotated, Literal, Optional
+from datetime import datetime, timedelta
+import datetime as dt
+from utils import MAX_PAGE_SIZE, PAGE_SIZE, flight_fields, flight_rows, format_itineraries, keyset, next_page, stream_ndjson
+import asyncio, os, time
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+ROUTE_GRAPH_SYNC_SECONDS = float(os.getenv("ROUTE_GRAPH_SYNC_SECONDS", 30))
+# full reloads run in the background, see keep_route_graph_reloaded
+ROUTE_GRAPH_RELOAD_SECONDS = float(os.getenv("ROUTE_GRAPH_RELOAD_SECONDS", 600))
+ITINERARY_SEARCH_ROUNDS = 3
 
 
 #### FLIGHT API #################################################################################
@@ -17,35 +21,185 @@ def get_db():
 flights_router = APIRouter(prefix="/flights", tags=["flights"])
 
 
+class FlightPage:
+    """Query parameters shared by the flight listings: keyset paging, projection and output format."""
+
+    def __init__(
+        self,
+        limit: Annotated[Optional[int], Query(ge=1, le=MAX_PAGE_SIZE, description=f"Page size, {PAGE_SIZE} by default; ndjson streams every row unless set")] = None,
+        cursor: Annotated[Optional[str], Query(description="X-Next-Cursor header of the previous page")] = None,
+        fields: Annotated[Optional[str], Query(description="Comma-separated fields to return", example="flight_number,departing_time")] = None,
+        include_seats: bool = False,
+        format: Literal["json", "ndjson"] = "json",
+    ):
+        self.limit = limit
+        self.cursor = cursor
+        self.fields = flight_fields(fields, include_seats)
+        self.format = format
+
+    async def respond(self, query: Select, keys: list, db: AsyncSession, response: Response):
+        if self.format == "ndjson":
+            # a stream has no next page to detect, it stops at exactly `limit` rows
+            query = keyset(query, keys, self.cursor, None).limit(self.limit)
+            return stream_ndjson(query, lambda db, flights: flight_rows(db, flights, self.fields))
+        limit = self.limit or PAGE_SIZE
+        flights = (await db.scalars(keyset(query, keys, self.cursor, limit))).all()
+        flights, cursor = next_page(flights, keys, limit)
+        if cursor:
+            response.headers["X-Next-Cursor"] = cursor
+        return await flight_rows(db, flights, self.fields)
+
+
 @flights_router.get("/list")
-async def list_all_flights(db: Session = Depends(get_db)):
-    flights = db.query(Flight).all()  # removed await
-    return format_flights_data(flights)
+async def list_all_flights(response: Response, page: FlightPage = Depends(), db: AsyncSession = Depends(get_db)):
+    return await page.respond(select(Flight), [Flight.id], db, response)
+
+
+def departure_window(departing_after: Optional[datetime], departing_before: Optional[datetime], date: Optional[dt.date]):
+    """
+    Departure window from the after/before/date parameters, narrowed to `date` when given.
+
+    Times are stored naive in server local time, times with a timezone are converted to it.
+    """
+    departing_after, departing_before = (
+        t.astimezone().replace(tzinfo=None) if t is not None and t.tzinfo else t for t in (departing_after, departing_before)
+    )
+    if date:
+        start = datetime.combine(date, dt.time())
+        departing_after = max(departing_after or start, start)
+        departing_before = min(departing_before or start + timedelta(days=1), start + timedelta(days=1))
+    return departing_after, departing_before
 
 
 @flights_router.get("/search")
 async def search_flights(
+    response: Response,
     from_city: str = None,
     to_city: str = None,
     flight_number: str = None,
-    db: Session = Depends(get_db),
+    departing_after: Annotated[Optional[datetime], Query(description="Earliest departure", example="2025-06-01T08:00:00")] = None,
+    departing_before: Annotated[Optional[datetime], Query(description="Latest departure, exclusive")] = None,
+    date: Annotated[Optional[dt.date], Query(description="Departure date")] = None,
+    page: FlightPage = Depends(),
+    db: AsyncSession = Depends(get_db),
 ):
+    keys = [Flight.id]
     if flight_number:
-        flights = (
-            db.query(Flight).filter(Flight.flight_number == flight_number).all()
-        )  # removed await
+        query = select(Flight).filter(Flight.flight_number == flight_number)
     elif from_city and to_city:
-        flights = (
-            db.query(Flight)
-            .filter(Flight.from_city == from_city, Flight.to_city == to_city)
-            .order_by(Flight.departing_time.asc())
-            .all()
-        )  # removed await
+        query = select(Flight).filter(Flight.from_city == from_city, Flight.to_city == to_city)
+        keys = [Flight.departing_time, Flight.id]
     elif from_city:
-        flights = db.query(Flight).filter(Flight.from_city == from_city).all()
+        query = select(Flight).filter(Flight.from_city == from_city)
     elif to_city:
-        flights = db.query(Flight).filter(Flight.to_city == to_city).all()
+        query = select(Flight).filter(Flight.to_city == to_city)
     else:
-        flights = db.query(Flight).all()  # removed await
+        query = select(Flight)
+
+    departing_after, departing_before = departure_window(departing_after, departing_before, date)
+    # a range on departing_time, which the route index serves right after the cities
+    if departing_after or departing_before:
+        if departing_after:
+            query = query.filter(Flight.departing_time >= departing_after)
+        if departing_before:
+            query = query.filter(Flight.departing_time < departing_before)
+        if keys == [Flight.id] and not flight_number:
+            keys = [Flight.departing_time, Flight.id]
+
+    return await page.respond(query, keys, db, response)
+
+
+def _schedule() -> Select:
+    return (
+        select(Flight.id, Flight.departing_time, Flight.arrival_time, Flight.flight_number, Flight.from_city, Flight.to_city)
+        .filter(Flight.departing_time.is_not(None), Flight.arrival_time.is_not(None))
+        .order_by(Flight.id)
+    )
+
+
+async def sync_route_graph(db: AsyncSession, force: bool = False):
+    """Add flights stored since the last sync to the route graph, at most every ROUTE_GRAPH_SYNC_SECONDS."""
+    if not force and time.monotonic() - route_graph.synced_at < ROUTE_GRAPH_SYNC_SECONDS:
+        return
+    route_graph.synced_at = time.monotonic()
+    legs = []
+    for flight_id, *leg in await db.execute(_schedule().filter(Flight.id > route_graph.last_id)):
+        legs.append(Leg(*leg))
+        route_graph.last_id = max(route_graph.last_id, flight_id)
+    if legs:
+        route_graph.add_all(legs)
+        print(f"Route graph: added {len(legs)} flights, {len(route_graph)} in total")
+
+
+async def reload_route_graph(db: AsyncSession):
+    """
+    Diff the whole flights table against the route graph.
+
+    Syncs only pick up new flights; flights changed or deleted in place, by a migration or
+    a schedule change made outside this server, are caught here. The diff runs in a thread,
+    searches carry on meanwhile.
+    """
+    route_graph.reloaded_at = time.monotonic()
+    legs = []
+    last_id = 0
+    for flight_id, *leg in await db.execute(_schedule()):
+        legs.append(Leg(*leg))
+        last_id = max(last_id, flight_id)
+    changed, removed = await asyncio.to_thread(route_graph.reconcile, legs)
+    # flights stored after the read above were removed again, the next sync adds them back
+    route_graph.last_id = last_id
+    if changed or removed:
+        print(f"Route graph: reloaded, {changed} flights added or changed, {removed} removed, {len(route_graph)} in total")
+
+
+async def keep_route_graph_reloaded():
+    """Reload the route graph every ROUTE_GRAPH_RELOAD_SECONDS, run as a background task of the app."""
+    while True:
+        await asyncio.sleep(ROUTE_GRAPH_RELOAD_SECONDS)
+        try:
+            async with SessionLocal() as db:
+                await reload_route_graph(db)
+        except Exception as e:
+            print(f"Route graph reload failed: {e}")
+
+
+@flights_router.get("/itineraries")
+async def search_itineraries(
+    from_city: str,
+    to_city: str,
+    departing_after: Annotated[Optional[datetime], Query(description="Earliest departure of the first leg, now by default")] = None,
+    departing_before: Annotated[Optional[datetime], Query(description="Latest departure of the first leg, exclusive")] = None,
+    date: Annotated[Optional[dt.date], Query(description="Departure date of the first leg")] = None,
+    max_legs: Annotated[int, Query(ge=1, le=4)] = 3,
+    min_connection_minutes: Annotated[int, Query(ge=0, le=24 * 60)] = 45,
+    max_connection_hours: Annotated[float, Query(gt=0, le=72)] = 24,
+    no_of_seats: Annotated[int, Query(ge=1, le=10)] = 1,
+    limit: Annotated[int, Query(ge=1, le=20)] = 5,
+    db: AsyncSession = Depends(get_db),
+):
+    """Direct and connecting itineraries between two cities, earliest arrival first."""
+    if from_city == to_city:
+        raise HTTPException(status_code=400, detail="from_city and to_city must be different cities")
+    await sync_route_graph(db)
+    departing_after, departing_before = departure_window(departing_after, departing_before, date)
+    departing_after = departing_after or datetime.now().replace(microsecond=0)
 
-    return format_flights_data(flights)
+    # the graph holds the schedule, seats change all the time and are checked here; legs
+    # without enough seats are excluded and the search rerun
+    sold_out = set()
+    for _ in range(ITINERARY_SEARCH_ROUNDS):
+        itineraries = route_graph.itineraries(
+            from_city, to_city, departing_after, departing_before,
+            max_legs=max_legs,
+            min_connection=timedelta(minutes=min_connection_minutes),
+            max_connection=timedelta(hours=max_connection_hours),
+            limit=limit,
+            exclude=sold_out,
+        )
+        seats = await free_seat_counts(db, list({leg.flight_number for itinerary in itineraries for leg in itinerary}))
+        full = {leg.flight_number for itinerary in itineraries for leg in itinerary if seats.get(leg.flight_number, 0) < no_of_seats}
+        if not full:
+            break
+        sold_out |= full
+    itineraries = [itinerary for itinerary in itineraries if not any(leg.flight_number in sold_out for leg in itinerary)]
+    return format_itineraries(itineraries, seats)
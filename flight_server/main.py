@@ -1,13 +1,32 @@
-from fastapi import FastAPI, Depends, APIRouter, HTTPException, Query
-from sqlalchemy.orm import Session
-import random
-from typing import List, Annotated
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI
 from booking import booking_router
-from flights import flights_router
+from flights import flights_router, keep_route_graph_reloaded, reload_route_graph
+from database import SessionLocal, engine, init_db
+from response_cache import ResponseCacheMiddleware, response_cache
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await init_db()
+    async with SessionLocal() as db:
+        await reload_route_graph(db)
+    reloader = asyncio.create_task(keep_route_graph_reloaded())
+    yield
+    reloader.cancel()
+    await engine.dispose()
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(ResponseCacheMiddleware)
+
+
+@app.get("/cache/stats", tags=["cache"])
+async def cache_stats():
+    return response_cache.stats()
+
 
 ###############################################################################################
 app.include_router(flights_router)
-app.include_router(booking_router)
+app.include_router(booking_router)
\ No newline at end of file
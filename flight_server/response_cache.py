@@ -0,0 +1,141 @@
+import hashlib, json, os, threading, time
+from collections import OrderedDict
+from fastapi import Request, Response
+from starlette.middleware.base import BaseHTTPMiddleware
+
+# read endpoints whose JSON responses are cached, each lists rows with a flight_number
+CACHED_PATHS = {"/flights/search", "/bookings/search"}
+
+
+class ResponseCache:
+    """
+    In-process LRU cache of read responses, keyed by path and query parameters.
+
+    Every entry remembers the flights its body lists, so a write to a flight drops
+    exactly the responses that mention it. Entries also expire after `ttl` seconds
+    to pick up writes made outside this process.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires, body, headers, flight numbers)
+        self._by_flight = {}  # flight number -> keys of entries listing it
+        self._clock = 0
+        self._invalidated_at = {}  # flight number -> clock of its last write
+        self._lock = threading.Lock()
+        self.counts = {"hits": 0, "misses": 0, "not_modified": 0, "invalidations": 0, "evictions": 0}
+
+    @staticmethod
+    def key(request: Request) -> tuple:
+        return (request.url.path, tuple(sorted(request.query_params.multi_items())))
+
+    def tick(self) -> int:
+        """Current clock, taken before a miss is computed and passed to `set`."""
+        with self._lock:
+            return self._clock
+
+    def get(self, key: tuple):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._drop(key)
+                self.counts["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.counts["hits"] += 1
+            return entry[1], entry[2]
+
+    def set(self, key: tuple, body: bytes, headers: dict, flight_numbers: set, since: int):
+        with self._lock:
+            # a flight written while this response was computed may be stale in it
+            if any(self._invalidated_at.get(f, -1) >= since for f in flight_numbers):
+                return
+            self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl, body, headers, flight_numbers)
+            for flight_number in flight_numbers:
+                self._by_flight.setdefault(flight_number, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.counts["evictions"] += 1
+
+    def invalidate_flight(self, flight_number: str):
+        """Drop every response listing `flight_number`, call after its seats or bookings changed."""
+        with self._lock:
+            self._invalidated_at[flight_number] = self._clock
+            self._clock += 1
+            for key in self._by_flight.pop(flight_number, set()):
+                self._drop(key)
+                self.counts["invalidations"] += 1
+
+    def _drop(self, key: tuple):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for flight_number in entry[3]:
+            keys = self._by_flight.get(flight_number)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_flight[flight_number]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_flight.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.counts["hits"] + self.counts["misses"]
+            return {
+                **self.counts,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hit_ratio": round(self.counts["hits"] / lookups, 4) if lookups else None,
+            }
+
+
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 1024)),
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL", 60)),
+)
+
+
+def etag(body: bytes) -> str:
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+def _flight_numbers(body: bytes) -> set:
+    rows = json.loads(body)
+    return {row["flight_number"] for row in rows if isinstance(row, dict) and "flight_number" in row}
+
+
+def _respond(request: Request, body: bytes, headers: dict) -> Response:
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        response_cache.counts["not_modified"] += 1
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+class ResponseCacheMiddleware(BaseHTTPMiddleware):
+    """Serve GETs of CACHED_PATHS from `response_cache`, with ETags and 304s for If-None-Match."""
+
+    async def dispatch(self, request: Request, call_next):
+        if request.method != "GET" or request.url.path not in CACHED_PATHS or request.query_params.get("format") == "ndjson":
+            return await call_next(request)
+        key = response_cache.key(request)
+        cached = response_cache.get(key)
+        if cached is not None:
+            return _respond(request, *cached)
+
+        since = response_cache.tick()
+        response = await call_next(request)
+        if response.status_code != 200:
+            return response
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        headers = {"ETag": etag(body), "Cache-Control": "no-cache"}
+        if "x-next-cursor" in response.headers:
+            headers["X-Next-Cursor"] = response.headers["x-next-cursor"]
+        response_cache.set(key, body, headers, _flight_numbers(body), since)
+        return _respond(request, body, headers)
@@ -0,0 +1,170 @@
+import bisect, heapq, itertools, threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set
+
+
+@dataclass(frozen=True, order=True)
+class Leg:
+    departing_time: datetime
+    arrival_time: datetime
+    flight_number: str
+    from_city: str
+    to_city: str
+
+
+class RouteGraph:
+    """
+    In-memory schedule of every flight, as city -> next city -> legs sorted by departure.
+
+    Itinerary searches run on it without touching the database: a best-first search on
+    arrival time over legs that respect a minimum connection time. Flights are added
+    and removed one at a time, so the graph follows the flights table incrementally.
+    """
+
+    def __init__(self):
+        self.edges: Dict[str, Dict[str, List[Leg]]] = {}
+        # departure times of each edge's legs, parallel to `edges` so bisect runs without a key function
+        self.departures: Dict[str, Dict[str, List[datetime]]] = {}
+        self.legs: Dict[str, Leg] = {}  # flight number -> leg
+        self.last_id = 0  # highest flights.id loaded, see sync_route_graph
+        self.synced_at = 0.0
+        self.reloaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.legs)
+
+    def add(self, leg: Leg):
+        with self._lock:
+            self._remove(leg.flight_number)
+            self.legs[leg.flight_number] = leg
+            legs_on_edge = self.edges.setdefault(leg.from_city, {}).setdefault(leg.to_city, [])
+            i = bisect.bisect_left(legs_on_edge, leg)
+            legs_on_edge.insert(i, leg)
+            self.departures.setdefault(leg.from_city, {}).setdefault(leg.to_city, []).insert(i, leg.departing_time)
+
+    def add_all(self, legs: Iterable[Leg]):
+        """Bulk load, sorting each edge once instead of inserting leg by leg."""
+        with self._lock:
+            self._add_all(legs)
+
+    def reconcile(self, legs: Iterable[Leg]) -> tuple[int, int]:
+        """
+        Make the graph hold exactly `legs`: flights that changed are re-added and flights
+        missing from `legs` removed, the rest is left alone. Returns (changed, removed).
+
+        The diff is worked out on a copy, searches only wait while the changes are applied,
+        so a reload of the whole schedule can run in a thread next to them.
+        """
+        legs = {leg.flight_number: leg for leg in legs}
+        with self._lock:
+            current = dict(self.legs)
+        removed = [flight_number for flight_number in current if flight_number not in legs]
+        changed = [leg for flight_number, leg in legs.items() if current.get(flight_number) != leg]
+        with self._lock:
+            for flight_number in removed:
+                self._remove(flight_number)
+            self._add_all(changed)
+        return len(changed), len(removed)
+
+    def _add_all(self, legs: Iterable[Leg]):
+        touched = set()
+        for leg in legs:
+            self._remove(leg.flight_number)
+            self.legs[leg.flight_number] = leg
+            self.edges.setdefault(leg.from_city, {}).setdefault(leg.to_city, []).append(leg)
+            touched.add((leg.from_city, leg.to_city))
+        for from_city, to_city in touched:
+            legs_on_edge = self.edges[from_city][to_city]
+            legs_on_edge.sort()
+            self.departures.setdefault(from_city, {})[to_city] = [leg.departing_time for leg in legs_on_edge]
+
+    def remove(self, flight_number: str):
+        with self._lock:
+            self._remove(flight_number)
+
+    def _remove(self, flight_number: str):
+        leg = self.legs.pop(flight_number, None)
+        if leg is not None:
+            legs_on_edge = self.edges[leg.from_city][leg.to_city]
+            i = bisect.bisect_left(legs_on_edge, leg)
+            legs_on_edge.pop(i)
+            self.departures[leg.from_city][leg.to_city].pop(i)
+
+    def itineraries(
+        self,
+        from_city: str,
+        to_city: str,
+        departing_after: datetime,
+        departing_before: Optional[datetime] = None,
+        max_legs: int = 3,
+        min_connection: timedelta = timedelta(minutes=45),
+        max_connection: timedelta = timedelta(hours=24),
+        limit: int = 5,
+        exclude: Set[str] = frozenset(),
+    ) -> List[List[Leg]]:
+        """
+        Up to `limit` itineraries from `from_city` to `to_city`, earliest arrival first.
+
+        The first leg departs in [departing_after, departing_before), every connection
+        leaves between `min_connection` and `max_connection` after the previous arrival,
+        no city is visited twice and flights in `exclude` (sold out) are skipped. From
+        every city only the earliest arriving leg to each next city is followed, and a
+        city is expanded at most `limit` times, which keeps a search to a few thousand
+        steps on any schedule size.
+        """
+        if from_city == to_city:
+            # the start would count as an arrival with no legs at all
+            return []
+        results = []
+        counter = itertools.count()
+        heap = [(departing_after, 0, next(counter), from_city, ())]
+        expanded = {}
+        with self._lock:
+            while heap and len(results) < limit:
+                arrival, _, _, city, path = heapq.heappop(heap)
+                if city == to_city:
+                    results.append(list(path))
+                    continue
+                if expanded.get(city, 0) >= limit or len(path) >= max_legs:
+                    continue
+                expanded[city] = expanded.get(city, 0) + 1
+                if path:
+                    earliest, latest = arrival + min_connection, arrival + max_connection
+                else:
+                    earliest, latest = departing_after, departing_before
+                visited = {from_city, *(leg.to_city for leg in path)}
+                edges = self.edges.get(city, {})
+                if len(path) == max_legs - 1:
+                    # the last leg has to land at the destination
+                    edges = {to_city: edges[to_city]} if to_city in edges else {}
+                for next_city, legs_on_edge in edges.items():
+                    # labels are popped in arrival order, a city expanded `limit` times only gets later ones
+                    if next_city in visited or expanded.get(next_city, 0) >= limit:
+                        continue
+                    departures = self.departures[city][next_city]
+                    leg = _earliest_arrival(legs_on_edge, departures, earliest, latest, exclude)
+                    if leg is not None:
+                        heapq.heappush(heap, (leg.arrival_time, len(path) + 1, next(counter), next_city, path + (leg,)))
+        return results
+
+
+def _earliest_arrival(
+    legs: List[Leg], departures: List[datetime], earliest: datetime, latest: Optional[datetime], exclude: Set[str]
+) -> Optional[Leg]:
+    """The leg departing in [earliest, latest) that lands first."""
+    best = None
+    for i in range(bisect.bisect_left(departures, earliest), len(legs)):
+        leg = legs[i]
+        if latest is not None and leg.departing_time >= latest:
+            break
+        if best is not None and leg.departing_time >= best.arrival_time:
+            # departs after the best one lands, cannot land before it
+            break
+        if leg.flight_number not in exclude and (best is None or leg.arrival_time < best.arrival_time):
+            best = leg
+    return best
+
+
+route_graph = RouteGraph()
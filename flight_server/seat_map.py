@@ -0,0 +1,107 @@
+import re
+from typing import Iterable, List, Optional
+
+SEAT_RE = re.compile(r"^([A-Z])(\d+)$")
+
+
+class SeatMap:
+    """
+    Free seats of one flight as one bitmask per row.
+
+    Bit i of a row is set while seat `letters[i]` of that row is free, so checking
+    or taking a seat is a single bit operation and a block of n adjacent seats in
+    a row is found with n shifts and ands. Seat numbers are letter then row ("A10").
+    Letters are treated as adjacent in layout order, the layout has no aisles.
+    """
+
+    def __init__(self, letters: str = "ABCD"):
+        self.letters = letters
+        self.rows = {}  # row -> bitmask of free seats
+
+    @classmethod
+    def from_seats(cls, seat_numbers: Iterable[str], letters: str = "ABCD") -> "SeatMap":
+        seat_map = cls(letters)
+        seat_map.release(seat_numbers)
+        return seat_map
+
+    def _bit(self, seat_number: str) -> tuple[int, int]:
+        match = SEAT_RE.match(seat_number)
+        if not match or match.group(1) not in self.letters:
+            raise ValueError(f"Seat {seat_number} is not in the layout {self.letters}")
+        return int(match.group(2)), 1 << self.letters.index(match.group(1))
+
+    def _seat(self, row: int, index: int) -> str:
+        return f"{self.letters[index]}{row}"
+
+    def __contains__(self, seat_number: str) -> bool:
+        try:
+            row, bit = self._bit(seat_number)
+        except ValueError:
+            return False
+        return bool(self.rows.get(row, 0) & bit)
+
+    def __len__(self) -> int:
+        return sum(mask.bit_count() for mask in self.rows.values())
+
+    def take(self, seat_numbers: Iterable[str]):
+        for seat_number in seat_numbers:
+            row, bit = self._bit(seat_number)
+            self.rows[row] = self.rows.get(row, 0) & ~bit
+
+    def release(self, seat_numbers: Iterable[str]):
+        for seat_number in seat_numbers:
+            row, bit = self._bit(seat_number)
+            self.rows[row] = self.rows.get(row, 0) | bit
+
+    def _row_order(self, near: Optional[int]) -> List[int]:
+        if near is None:
+            return sorted(self.rows)
+        return sorted(self.rows, key=lambda row: (abs(row - near), row))
+
+    def find_block(self, n: int, near: Optional[int] = None) -> Optional[List[str]]:
+        """
+        Pick n free seats that sit together, None when fewer than n are free.
+
+        The first row (closest to row `near` if given) with n adjacent free seats wins;
+        when no row has such a run, or n is wider than a row, the group is spread over
+        as few neighbouring rows as the free seats allow.
+        """
+        if n > len(self):
+            return None
+        rows = self._row_order(near)
+        if n <= len(self.letters):
+            for row in rows:
+                free = starts = self.rows[row]
+                # a bit survives when it and the n-1 seats after it are free
+                for k in range(1, n):
+                    starts &= free >> k
+                if starts:
+                    first = (starts & -starts).bit_length() - 1
+                    return [self._seat(row, first + k) for k in range(n)]
+        if near is None:
+            # no single row fits: start from the row with the most free seats and work outwards
+            rows = self._row_order(max(rows, key=lambda row: self.rows[row].bit_count()))
+        seats = []
+        for row in rows:
+            mask = self.rows[row]
+            while mask and len(seats) < n:
+                low = mask & -mask
+                seats.append(self._seat(row, low.bit_length() - 1))
+                mask ^= low
+            if len(seats) == n:
+                break
+        return seats
+
+    def row_of(self, seat_number: str) -> int:
+        return self._bit(seat_number)[0]
+
+    def to_list(self) -> List[str]:
+        """Free seats in row order, the order the API lists them in."""
+        seats = []
+        for row in sorted(self.rows):
+            mask = self.rows[row]
+            while mask:
+                low = mask & -mask
+                seats.append(self._seat(row, low.bit_length() - 1))
+                mask ^= low
+        return seats
@@ -0,0 +1,121 @@
+"""
+Concurrency stress test for the booking endpoints of a running flight_server.
+
+Fires many concurrent bookings and seat changes at one flight, then checks that
+no seat was sold twice and that every seat is either free or held by exactly one
+booking. Exits non-zero when the inventory is inconsistent.
+
+    python stress_booking.py --url http://localhost:8000 --requests 200 --concurrency 50
+
+With --bulk-size the bookings go through /bookings/bulk in batches of that many items.
+"""
+import argparse, asyncio, random, sys, time
+from collections import Counter
+import httpx
+
+
+async def flight_seats(client: httpx.AsyncClient, flight_number: str) -> tuple[list[str], list[dict]]:
+    flight = (await client.get("/flights/search", params={"flight_number": flight_number, "include_seats": "true"})).json()[0]
+    bookings = (await client.get("/bookings/search", params={"flight_number": flight_number})).json()[0]["bookings"]
+    return flight["available_seats"], bookings
+
+
+async def stress(
+    url: str, flight_number: str, requests: int, concurrency: int, amend_ratio: float, seed: int, bulk_size: int = 0
+) -> bool:
+    rng = random.Random(seed)
+    async with httpx.AsyncClient(base_url=url, timeout=60) as client:
+        if not flight_number:
+            flights = (await client.get("/flights/list", params={"include_seats": "true", "limit": 1000})).json()
+            flight_number = max(flights, key=lambda f: len(f["available_seats"]))["flight_number"]
+        free_before, bookings_before = await flight_seats(client, flight_number)
+        seats_before = len(free_before) + sum(len(b["seat_numbers"]) for b in bookings_before)
+        print(f"Flight {flight_number}: {len(free_before)} free of {seats_before} seats, {requests} requests")
+
+        semaphore = asyncio.Semaphore(concurrency)
+        confirmations = []
+        outcomes = Counter()
+
+        async def book():
+            async with semaphore:
+                response = await client.post("/bookings/book", params={
+                    "flight_number": flight_number,
+                    "passenger_name": "Stress Tester",
+                    "no_of_seats": rng.randint(1, 3),
+                })
+            outcomes[f"book {response.status_code}"] += 1
+            if response.status_code == 200:
+                confirmations.append(response.json()["confirmation_number"])
+
+        async def book_bulk(size: int):
+            async with semaphore:
+                response = await client.post("/bookings/bulk", json={
+                    "mode": "best_effort",
+                    "items": [
+                        {"flight_number": flight_number, "passenger_name": "Stress Tester", "no_of_seats": rng.randint(1, 3)}
+                        for _ in range(size)
+                    ],
+                })
+            outcomes[f"bulk {response.status_code}"] += 1
+            for result in response.json().get("results", []) if response.status_code == 200 else []:
+                outcomes[f"bulk item {result['status']}"] += 1
+                if result["status"] == "booked":
+                    confirmations.append(result["confirmation_number"])
+
+        async def amend():
+            if not confirmations:
+                return await book()
+            confirmation_number = rng.choice(confirmations)
+            async with semaphore:
+                booking = (await client.get("/bookings/list", params={"confirmation_number": confirmation_number})).json()[0]
+                response = await client.put("/bookings/amend", params={
+                    "confirmation_number": confirmation_number,
+                    "seat_number_from": rng.choice(booking["seat_numbers"]),
+                    # aim at seats that were free at the start, so amendments race with bookings
+                    "seat_number_to": rng.choice(free_before),
+                })
+            outcomes[f"amend {response.status_code}"] += 1
+
+        started = time.perf_counter()
+        if bulk_size:
+            await asyncio.gather(*(book_bulk(min(bulk_size, requests - i)) for i in range(0, requests, bulk_size)))
+        else:
+            await asyncio.gather(*(amend() if rng.random() < amend_ratio else book() for _ in range(requests)))
+        elapsed = time.perf_counter() - started
+
+        free_after, bookings_after = await flight_seats(client, flight_number)
+
+    held = Counter(seat for b in bookings_after for seat in b["seat_numbers"])
+    double_sold = sorted(seat for seat, count in held.items() if count > 1)
+    free_and_held = sorted(set(free_after) & set(held))
+    seats_after = len(free_after) + sum(held.values())
+
+    print(f"{requests} requests in {elapsed:.2f}s ({requests / elapsed:.1f}/s): {dict(sorted(outcomes.items()))}")
+    print(f"{len(free_after)} seats free, {len(held)} held by {len(bookings_after)} bookings")
+    ok = True
+    if double_sold:
+        ok = False
+        print(f"FAIL seats held by more than one booking: {double_sold}")
+    if free_and_held:
+        ok = False
+        print(f"FAIL seats both free and held: {free_and_held}")
+    if seats_after != seats_before:
+        ok = False
+        print(f"FAIL seat count changed from {seats_before} to {seats_after}")
+    if ok:
+        print("OK no seat was sold twice")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent booking stress test against a running flight_server.")
+    parser.add_argument("--url", default="http://localhost:8000", help="Base URL of the flight_server.")
+    parser.add_argument("--flight", default=None, help="Flight to hammer, defaults to the one with the most free seats.")
+    parser.add_argument("--requests", type=int, default=200, help="Number of book or amend requests.")
+    parser.add_argument("--concurrency", type=int, default=50, help="Requests in flight at once.")
+    parser.add_argument("--amend-ratio", type=float, default=0.3, help="Share of requests that change a seat.")
+    parser.add_argument("--bulk-size", type=int, default=0, help="Send bookings to /bookings/bulk in batches of this size.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    ok = asyncio.run(stress(args.url, args.flight, args.requests, args.concurrency, args.amend_ratio, args.seed, args.bulk_size))
+    sys.exit(0 if ok else 1)
@@ -1,20 +1,161 @@
 
-from database import Flight
-from typing import List
+from database import SessionLocal, available_seats, Flight, Booking
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import DateTime, Select, tuple_
+from datetime import datetime
+from typing import Dict, List, Optional
+import base64, binascii, json, os
 
 ####################### HELPER FUNCTIONS ########################################################
 
+FLIGHT_FIELDS = [
+    "flight_number", "departure_city", "arrival_city", "departing_time", "arrival_time", "flight_duration", "available_seats",
+]
+PAGE_SIZE = int(os.getenv("PAGE_SIZE", 100))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", 1000))
+# rows fetched per round trip from the server-side cursor of a streamed response
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", 500))
+# times are stored as timestamps and served in the format they were stored in as text
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
 
-def format_flights_data(flights: List[Flight]):
-    return [
-        {
+
+def format_flights_data(flights: List[Flight], seats: Optional[Dict[str, List[str]]] = None, fields: List[str] = FLIGHT_FIELDS):
+    """`seats` maps flight numbers to their free seats, see database.available_seats."""
+    rows = []
+    for f in flights:
+        row = {
             "flight_number": f.flight_number,
             "departure_city": f.from_city,
             "arrival_city": f.to_city,
-            "departing_time": f.departing_time,
-            "arrival_time": f.arrival_time,
+            "departing_time": format_time(f.departing_time),
+            "arrival_time": format_time(f.arrival_time),
             "flight_duration": f.flight_duration,
-            "available_seats": f.available_seats,
+            "available_seats": seats.get(f.flight_number, []) if seats is not None else None,
+        }
+        rows.append({field: row[field] for field in fields})
+    return rows
+
+
+def format_time(value: Optional[datetime]) -> Optional[str]:
+    return value.strftime(TIME_FORMAT) if value is not None else None
+
+
+def format_itineraries(itineraries: list, seats: Dict[str, int]):
+    """Itineraries of route_graph.Leg with the free seat count of every leg."""
+    return [
+        {
+            "departing_time": format_time(itinerary[0].departing_time),
+            "arrival_time": format_time(itinerary[-1].arrival_time),
+            "duration_hours": round((itinerary[-1].arrival_time - itinerary[0].departing_time).total_seconds() / 3600, 2),
+            "connections": len(itinerary) - 1,
+            "legs": [
+                {
+                    "flight_number": leg.flight_number,
+                    "departure_city": leg.from_city,
+                    "arrival_city": leg.to_city,
+                    "departing_time": format_time(leg.departing_time),
+                    "arrival_time": format_time(leg.arrival_time),
+                    "free_seats": seats.get(leg.flight_number, 0),
+                }
+                for leg in itinerary
+            ],
         }
-        for f in flights
+        for itinerary in itineraries
     ]
+
+
+def format_bookings_data(bookings: List[Booking]):
+    return [
+        {
+            "flight_number": b.flight_number,
+            "passenger_name": b.passenger_name,
+            "seat_numbers": b.seat_numbers,
+            "confirmation_number": b.confirmation_number,
+        }
+        for b in bookings
+    ]
+
+
+def flight_fields(fields: Optional[str], include_seats: bool) -> List[str]:
+    """
+    Fields to return for flights: the comma-separated `fields`, or every field.
+
+    The seat list is the bulk of a flight, it is only returned when asked for
+    with include_seats or by naming available_seats in `fields`.
+    """
+    selected = [f.strip() for f in fields.split(",") if f.strip()] if fields else FLIGHT_FIELDS[:-1]
+    unknown = [f for f in selected if f not in FLIGHT_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields {unknown}, choose from {FLIGHT_FIELDS}")
+    if include_seats and "available_seats" not in selected:
+        selected.append("available_seats")
+    return selected
+
+
+async def flight_rows(db, flights: List[Flight], fields: List[str]) -> List[dict]:
+    seats = await available_seats(db, [f.flight_number for f in flights]) if "available_seats" in fields else None
+    return format_flights_data(flights, seats, fields)
+
+
+async def booking_rows(db, bookings: List[Booking]) -> List[dict]:
+    return format_bookings_data(bookings)
+
+
+def encode_cursor(values: list) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values, default=str).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset(query: Select, keys: list, cursor: Optional[str], limit: Optional[int]) -> Select:
+    """
+    Order `query` by the `keys` columns and start after `cursor`.
+
+    The keys must end in a unique column (the primary key) so that every row has its
+    own position; one more row than `limit` is fetched to tell whether a next page exists.
+    """
+    query = query.order_by(*keys)
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != len(keys):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        values = [
+            datetime.fromisoformat(value) if isinstance(key.type, DateTime) and value is not None else value
+            for key, value in zip(keys, values)
+        ]
+        query = query.filter(tuple_(*keys) > tuple(values))
+    if limit:
+        query = query.limit(limit + 1)
+    return query
+
+
+def next_page(rows: list, keys: list, limit: Optional[int]) -> tuple[list, Optional[str]]:
+    """Trim the extra row fetched by keyset() and return the cursor of the next page, if any."""
+    if not limit or len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor([getattr(rows[-1], key.key) for key in keys])
+
+
+def stream_ndjson(query: Select, to_rows) -> StreamingResponse:
+    """
+    Stream the rows of `query` as newline delimited JSON, batch by batch from a server-side cursor.
+
+    `to_rows(db, objects)` formats one batch. The response opens its own session, the
+    request's session is already closed while the body is being sent.
+    """
+
+    async def lines():
+        async with SessionLocal() as db:
+            result = await db.stream_scalars(query.execution_options(yield_per=STREAM_BATCH_SIZE))
+            async for batch in result.partitions():
+                rows = await to_rows(db, batch)
+                yield "".join(json.dumps(row, default=str) + "\n" for row in rows)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
@@ -77,3 +77,10 @@ flight_search_agent.handoffs.append(flight_booking_agent)
 faq_agent.handoffs.append(triage_agent)
 flight_booking_agent.handoffs.append(triage_agent)
 flight_booking_agent.handoffs.append(flight_search_agent)
+
+# Specialists the local intent router (router.py) may hand a first message to directly
+routes = {
+    "faq": faq_agent,
+    "flight_search": flight_search_agent,
+    "flight_booking": flight_booking_agent,
+}
@@ -0,0 +1,174 @@
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache with an optional time-to-live per entry.
+
+    The cache is bounded by number of entries and, when `sizeof` is given, by the
+    approximate number of bytes held. Least recently used entries are evicted first.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = None, max_bytes: int = None, sizeof=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof or (lambda value: 0)
+        self._entries = OrderedDict()  # key -> (value, expires_at, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._expired(entry):
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            expires_at = time.monotonic() + self.ttl if self.ttl else None
+            size = self.sizeof(value)
+            self._entries[key] = (value, expires_at, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or (
+                self.max_bytes is not None and self._bytes > self.max_bytes and len(self._entries) > 1
+            ):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            self._remove(key)
+            return entry[0]
+
+    def items(self):
+        """Snapshot of the live (key, value) pairs, most recently used last."""
+        with self._lock:
+            return [(k, e[0]) for k, e in self._entries.items() if not self._expired(e)]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _expired(self, entry) -> bool:
+        return entry[1] is not None and entry[1] < time.monotonic()
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+
+class SemanticCache:
+    """
+    Answer cache keyed by question text with a near-duplicate fallback.
+
+    `get` matches the normalised question exactly and needs no embedding.
+    `get_similar` compares the question embedding against the cached ones and
+    returns the answer of the closest entry when its cosine similarity is at or
+    above `threshold`, so paraphrases of a recent question reuse its answer.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = None, threshold: float = 0.9, max_bytes: int = None):
+        self.threshold = threshold
+        self._store = TTLCache(max_entries=max_entries, ttl=ttl, max_bytes=max_bytes, sizeof=self._sizeof)
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(question: str) -> str:
+        return re.sub(r"\s+", " ", re.sub(r"[^\w\s]", " ", question.lower())).strip()
+
+    @staticmethod
+    def _sizeof(entry) -> int:
+        answer, vector = entry
+        return sys.getsizeof(answer) + (vector.nbytes if vector is not None else 0)
+
+    def get(self, question: str, namespace=None):
+        entry = self._store.get((namespace, self.normalize(question)))
+        if entry is None:
+            return None
+        self.exact_hits += 1
+        return entry[0]
+
+    def get_similar(self, vector, namespace=None):
+        entries = [
+            (key, entry)
+            for key, entry in self._store.items()
+            if key[0] == namespace and entry[1] is not None
+        ]
+        if entries:
+            query = self._unit(vector)
+            scores = np.stack([entry[1] for _, entry in entries]) @ query
+            best = int(np.argmax(scores))
+            if scores[best] >= self.threshold:
+                key, entry = entries[best]
+                self._store.get(key)  # refresh LRU position
+                self.semantic_hits += 1
+                return entry[0]
+        self.misses += 1
+        return None
+
+    def put(self, question: str, vector, answer: str, namespace=None):
+        """Cache an answer; without a vector the entry only serves exact matches."""
+        self._store.set(
+            (namespace, self.normalize(question)),
+            (answer, self._unit(vector) if vector is not None else None),
+        )
+
+    def clear(self):
+        self._store.clear()
+
+    def stats(self) -> dict:
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        store = self._store.stats()
+        return {
+            "entries": store["entries"],
+            "bytes": store["bytes"],
+            "evictions": store["evictions"],
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0,
+        }
+
+    @staticmethod
+    def _unit(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
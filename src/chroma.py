@@ -1,50 +1,125 @@
-from langchain_community.document_loaders import DirectoryLoader
-from langchain_text_splitters import MarkdownHeaderTextSplitter, RecursiveCharacterTextSplitter
 import os
+import threading
 from config import config
-from uuid import uuid4
-import chromadb
 from langchain_chroma import Chroma
+from cache import SemanticCache
+from ingest import IngestionPipeline
+from keyword_index import BM25Index, reciprocal_rank_fusion
+from telemetry import span
 
 class ChromaClient:
     def __init__(self):
         self.embeddings = config.embeddings  # use shared embeddings from config
-        etc_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "./etc"))
-        chromadb_path = os.path.join(etc_path,"chroma_langchain_db")
-
-        if os.path.exists(chromadb_path):
-            persistent_client = chromadb.PersistentClient(path=chromadb_path)
-            self.vector_store = Chroma(
-                client=persistent_client,
-                collection_name="example_collection",
-                embedding_function=self.embeddings,
-            )
-        else:
-            loader = DirectoryLoader(etc_path, glob="**/*.txt")
-            docs = loader.load()
-            headers_to_split_on = [
-                ("#", "Header 1"),
-                ("##", "Header 2"),
-            ]
-            markdown_splitter = MarkdownHeaderTextSplitter(headers_to_split_on=headers_to_split_on)
-            md_header_splits = markdown_splitter.split_text(docs[0].page_content)
-            # Char-level splits
-            chunk_size = 500
-            chunk_overlap = 30
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=chunk_size, chunk_overlap=chunk_overlap
-            )
-            splits = text_splitter.split_documents(md_header_splits)
-            self.vector_store = Chroma(
-                collection_name="example_collection",
-                embedding_function=self.embeddings,
-                persist_directory=chromadb_path,
+        self.answer_cache = SemanticCache(
+            max_entries=int(config.get("FAQ_CACHE_MAX_ENTRIES", 256)),
+            ttl=float(config.get("FAQ_CACHE_TTL", 3600)),
+            threshold=float(config.get("FAQ_CACHE_SIMILARITY", 0.9)),
+            max_bytes=int(config.get("FAQ_CACHE_MAX_BYTES", 32 * 1024 * 1024)),
+        )
+        self.etc_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "./etc"))
+        self.chromadb_path = config.get("CHROMADB_PATH", os.path.join(self.etc_path, "chroma_langchain_db"))
+        self.vector_store = Chroma(
+            collection_name="example_collection",
+            embedding_function=self.embeddings,
+            persist_directory=self.chromadb_path,
+        )
+        self.keyword_index = BM25Index()
+        # keyword-only answers need a clear winner: every query term matched, a minimum
+        # BM25 score and a lead over the runner-up
+        self.keyword_min_score = float(config.get("FAQ_KEYWORD_MIN_SCORE", 3.0))
+        self.keyword_margin = float(config.get("FAQ_KEYWORD_MARGIN", 1.5))
+        self.search_counts = {"keyword": 0, "hybrid": 0}
+        self._reindex_lock = threading.Lock()
+        self.reindex()
+
+    def reindex(self, full: bool = False, batch_size: int = None, max_parallel: int = None) -> dict:
+        """
+        Bring the collection in line with the documents under etc/.
+
+        Only chunks whose content hash is not yet stored are embedded, and stale
+        chunks are deleted after the new ones are written, so searches keep
+        working while this runs.
+        """
+        with self._reindex_lock:
+            pipeline = IngestionPipeline(
+                self.vector_store._collection,
+                self.embeddings,
+                self.etc_path,
+                batch_size=batch_size or int(config.get("INGEST_BATCH_SIZE", 64)),
+                max_parallel=max_parallel or int(config.get("INGEST_MAX_PARALLEL", 4)),
+                journal_path=os.path.join(self.chromadb_path, "ingest_journal.jsonl"),
             )
-            uuids = [str(uuid4()) for _ in range(len(splits))]
-            self.vector_store.add_documents(documents=splits, ids=uuids)
+            stats = pipeline.run(full=full)
+            if stats["embedded"] or stats["removed"] or not len(self.keyword_index):
+                self.rebuild_keyword_index()
+                self.answer_cache.clear()  # cached answers refer to the previous collection
+            print(f"Reindexed FAQ corpus: {stats}")
+            return stats
+
+    def reindex_in_background(self) -> threading.Thread:
+        thread = threading.Thread(target=self.reindex, name="faq-reindex", daemon=True)
+        thread.start()
+        return thread
+
+    def rebuild_keyword_index(self):
+        collection = self.vector_store._collection
+        ids, documents, offset, page = [], [], 0, 10_000
+        while True:
+            batch = collection.get(include=["documents"], limit=page, offset=offset)
+            ids.extend(batch["ids"])
+            documents.extend(batch["documents"])
+            if len(batch["ids"]) < page:
+                break
+            offset += page
+        self.keyword_index.build(ids, documents)
+
+    def _keyword_decisive(self, hits) -> bool:
+        if not hits:
+            return False
+        _, _, score, coverage = hits[0]
+        runner_up = hits[1][2] if len(hits) > 1 else 0.0
+        return coverage == 1.0 and score >= self.keyword_min_score and score >= self.keyword_margin * runner_up
 
     def similarity_search(self, query: str, k: int = 2):
-        results = self.vector_store.similarity_search(query, k=k)
-        return "\n".join([res.page_content for res in results])
+        answer = self.answer_cache.get(query, namespace=k)
+        if answer is not None:
+            return answer
+
+        fetch_k = max(k * 5, 10)
+        keyword_hits = self.keyword_index.search(query, k=fetch_k)
+        if self._keyword_decisive(keyword_hits):
+            # decisive lexical match, answer without an embedding round-trip
+            self.search_counts["keyword"] += 1
+            answer = "\n".join(document for _, document, _, _ in keyword_hits[:k])
+            self.answer_cache.put(query, None, answer, namespace=k)
+            return answer
+
+        with span("embedding", "query"):
+            vector = self.embeddings.embed_query(query)
+        answer = self.answer_cache.get_similar(vector, namespace=k)
+        if answer is not None:
+            return answer
+        self.search_counts["hybrid"] += 1
+        with span("chroma", "query"):
+            results = self.vector_store._collection.query(
+                query_embeddings=[vector], n_results=fetch_k, include=["documents"]
+            )
+        documents = dict(zip(results["ids"][0], results["documents"][0]))
+        documents.update((chunk_id, document) for chunk_id, document, _, _ in keyword_hits)
+        ranked = reciprocal_rank_fusion(results["ids"][0], [chunk_id for chunk_id, _, _, _ in keyword_hits])
+        answer = "\n".join(documents[chunk_id] for chunk_id in ranked[:k])
+        self.answer_cache.put(query, vector, answer, namespace=k)
+        return answer
+
+_client = None
+_client_lock = threading.Lock()
+
 
-client = ChromaClient()
\ No newline at end of file
+def get_client() -> ChromaClient:
+    """Shared ChromaClient, built (and the corpus brought up to date) on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = ChromaClient()
+    return _client
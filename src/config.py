@@ -1,8 +1,6 @@
 import os
+import threading
 from dotenv import load_dotenv
-from langchain_openai import OpenAIEmbeddings  # new import
-from langchain_ollama import OllamaEmbeddings      # new import
-from openai import AsyncOpenAI                      # new import
 from agents import set_default_openai_client
 
 class ConfigManager:
@@ -18,26 +16,98 @@ class ConfigManager:
         """Load environment variables from .env file and system."""
         load_dotenv()  # Load variables from a .env file (if available)
         self.env_vars = {key: value for key, value in os.environ.items()}
-        # Instantiate shared objects for embeddings and LLM:
-        use_external_client = self.env_vars.get("USE_EXTERNAL_CLIENT", "False").lower() == "true"
-        if use_external_client:
-            self.embeddings = OllamaEmbeddings(
-                model=self.env_vars.get("EXTERNAL_EMB_MODEL"),
+        # Shared objects for embeddings and LLM are built on first use, see the properties below
+        self.use_external_client = self.env_vars.get("USE_EXTERNAL_CLIENT", "False").lower() == "true"
+        if self.use_external_client:
+            self.model_name = self.env_vars.get("EXTERNAL_LLM_MODEL")
+            self.embedding_model_name = self.env_vars.get("EXTERNAL_EMB_MODEL")
+            print(f"Using external client base model: {self.model_name}, embedding model: {self.embedding_model_name}")
+        else:
+            self.model_name = self.env_vars.get("OPENAI_MODEL")
+            self.embedding_model_name = "text-embedding-3-large"
+        # live calls the LLM, record also saves every model call to disk, replay serves them back offline
+        self.model_mode = self.env_vars.get("MODEL_MODE", "live").lower()
+        self.model_recording_path = self.env_vars.get(
+            "MODEL_RECORDING_PATH",
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), "etc", "model_recording.jsonl"),
+        )
+        # retries of LLM calls are done by ResilientModel (model.py) unless it is switched off
+        self.llm_resilience = self.env_vars.get("LLM_RESILIENCE", "True").lower() == "true"
+        self._embeddings = None
+        self._llm_client = None
+        self._fallback_llm_client = None
+        self._lock = threading.Lock()
+
+    @property
+    def embeddings(self):
+        """Shared embeddings backend, built on first use."""
+        if self._embeddings is None:
+            with self._lock:
+                if self._embeddings is None:
+                    self._embeddings = self._build_embeddings()
+        return self._embeddings
+
+    @property
+    def llm_client(self):
+        """Shared AsyncOpenAI client, built on first use."""
+        if self._llm_client is None:
+            with self._lock:
+                if self._llm_client is None:
+                    self._llm_client = self._build_llm_client()
+        return self._llm_client
+
+    @property
+    def fallback_llm_client(self):
+        """AsyncOpenAI client for LLM_FALLBACK_BASE_URL, None when no fallback endpoint is set."""
+        if self._fallback_llm_client is None and self.env_vars.get("LLM_FALLBACK_BASE_URL"):
+            with self._lock:
+                if self._fallback_llm_client is None:
+                    from openai import AsyncOpenAI
+                    self._fallback_llm_client = AsyncOpenAI(
+                        base_url=self.env_vars.get("LLM_FALLBACK_BASE_URL"),
+                        api_key=self.env_vars.get("LLM_FALLBACK_API_KEY") or self.env_vars.get("EXTERNAL_API_KEY"),
+                        max_retries=0 if self.llm_resilience else 2,
+                    )
+        return self._fallback_llm_client
+
+    def _build_embeddings(self):
+        # backend packages are imported here so that importing config stays cheap
+        if self.use_external_client:
+            from langchain_ollama import OllamaEmbeddings
+            embeddings = OllamaEmbeddings(
+                model=self.embedding_model_name,
                 base_url=self.env_vars.get("EXTERNAL_BASE_URL").replace("/v1", ""),
             )
-            self.llm_client = AsyncOpenAI(
+        else:
+            from langchain_openai import OpenAIEmbeddings
+            embeddings = OpenAIEmbeddings(model=self.embedding_model_name)
+        if self.env_vars.get("EMBEDDING_CACHE", "True").lower() == "true":
+            from embedding_cache import CachedEmbeddings
+            embeddings = CachedEmbeddings(
+                embeddings,
+                model_name=self.embedding_model_name,
+                path=self.env_vars.get(
+                    "EMBEDDING_CACHE_PATH",
+                    os.path.join(os.path.dirname(os.path.abspath(__file__)), "etc", "embedding_cache.sqlite3"),
+                ),
+                max_entries=int(self.env_vars.get("EMBEDDING_CACHE_MEMORY_ENTRIES", 4096)),
+            )
+        return embeddings
+
+    def _build_llm_client(self):
+        from openai import AsyncOpenAI
+        if self.use_external_client:
+            llm_client = AsyncOpenAI(
                 base_url=self.env_vars.get("EXTERNAL_BASE_URL"),
-                api_key=self.env_vars.get("EXTERNAL_API_KEY")
+                api_key=self.env_vars.get("EXTERNAL_API_KEY"),
+                max_retries=0 if self.llm_resilience else 2,
             )
-            set_default_openai_client(self.llm_client, False)
-            self.model_name = self.env_vars.get("EXTERNAL_LLM_MODEL")
-            print(f"Using external client base model: {self.model_name}, embedding model: {self.env_vars.get('EXTERNAL_EMB_MODEL')}")
+            set_default_openai_client(llm_client, False)
         else:
-            self.embeddings = OpenAIEmbeddings(model="text-embedding-3-large")
-            self.llm_client = AsyncOpenAI() 
-            self.model_name = self.env_vars.get("OPENAI_MODEL")
-            set_default_openai_client(self.llm_client)
-        
+            llm_client = AsyncOpenAI(max_retries=0 if self.llm_resilience else 2)
+            set_default_openai_client(llm_client)
+        return llm_client
+
     def get(self, key, default=None):
         """Retrieve an environment variable, with an optional default."""
         return self.env_vars.get(key, default)
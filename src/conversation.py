@@ -0,0 +1,161 @@
+import asyncio
+import json
+import re
+import uuid
+import httpx
+from agents import Runner, ItemHelpers, trace
+from openai import APITimeoutError
+from openai.types.responses import ResponseTextDeltaEvent
+from model import AirlineAgentContext
+from resilient_model import LLMOverloadedError
+from agent_def import triage_agent, routes
+from router import get_router
+from history import ConversationHistory
+from turn_metrics import TurnMetrics
+
+agents_by_name = {agent.name: agent for agent in [triage_agent, *routes.values()]}
+
+
+def strip_think(text: str) -> str:
+    # drop reasoning blocks, including one that is still being streamed
+    return re.sub(r'<think>.*?(</think>\s*|$)', '', text, flags=re.DOTALL)
+
+
+class ChatSession:
+    """State of one conversation: transcript, active agent and booking context."""
+
+    def __init__(self, session_id: str = None):
+        self.session_id = session_id or uuid.uuid4().hex[:16]
+        self.history = ConversationHistory()
+        self.current_agent = triage_agent
+        self.context = AirlineAgentContext()
+        self.busy = False  # a turn is running
+        self.cancel_requested = False
+        self.deleted = False  # removed from the store while a turn was running
+
+    def to_dict(self) -> dict:
+        """Serializable form for session stores that keep state outside the process."""
+        return {
+            "session_id": self.session_id,
+            "messages": self.history.messages,
+            "summary_lines": self.history.summary_lines,
+            "folded": self.history.folded,
+            "current_agent": self.current_agent.name,
+            "context": self.context.model_dump(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ChatSession":
+        session = cls(data["session_id"])
+        session.history.messages = data["messages"]
+        session.history.summary_lines = data["summary_lines"]
+        session.history.folded = data["folded"]
+        session.current_agent = agents_by_name.get(data["current_agent"], triage_agent)
+        session.context = AirlineAgentContext(**data["context"])
+        return session
+
+
+def _cancel_run(result):
+    # openai-agents only grew a public cancel() in later releases
+    if hasattr(result, "cancel"):
+        result.cancel()
+    else:
+        result._cleanup_tasks()
+
+
+async def run_turn(session: ChatSession, user_input: str):
+    """
+    Run one user message through the agents and yield UI events as plain dicts.
+
+    Event types: token, tool_call, tool_output, handoff, message, error,
+    cancelled and finally done (with the reply text and turn metrics).
+    """
+    metrics = TurnMetrics()
+    session.cancel_requested = False
+    session.history.append("user", user_input)
+
+    starting_agent = session.current_agent
+    router = get_router()
+    if router is not None and starting_agent is triage_agent:
+        # skip the triage LLM hop when the local router is confident
+        label = await asyncio.to_thread(router.route, user_input)
+        if label is not None:
+            starting_agent = routes[label]
+
+    response_text = ""
+    with trace('FlightAgent', group_id=session.session_id):
+        result = Runner.run_streamed(
+            starting_agent,
+            session.history.build_input(session.context),
+            context=session.context,
+        )
+        try:
+            async for event in result.stream_events():
+                if session.cancel_requested:
+                    break
+                if event.type == "raw_response_event":
+                    if isinstance(event.data, ResponseTextDeltaEvent):
+                        metrics.mark("first_token")
+                        yield {"type": "token", "delta": event.data.delta}
+                elif event.type == "agent_updated_stream_event":
+                    session.current_agent = event.new_agent
+                elif event.type == "run_item_stream_event":
+                    if event.item.type == "tool_call_item":
+                        metrics.mark("first_tool_call")
+                        yield {"type": "tool_call", "agent": event.item.agent.name}
+                    elif event.item.type == "tool_call_output_item":
+                        print(f"Tool output {event.item.output}")
+                        yield {"type": "tool_output", "output": str(event.item.output)}
+                    elif event.item.type == "handoff_output_item":
+                        yield {
+                            "type": "handoff",
+                            "source": event.item.source_agent.name,
+                            "target": event.item.target_agent.name,
+                        }
+                    elif event.item.type == "message_output_item":
+                        response_text = strip_think(ItemHelpers.text_message_output(event.item))
+                        yield {"type": "message", "text": response_text}
+        except APITimeoutError:
+            response_text = "Unable to reach AI"
+            yield {"type": "error", "message": response_text}
+        except LLMOverloadedError:
+            response_text = "The assistant is busy right now, please try again in a moment"
+            yield {"type": "error", "message": response_text}
+        finally:
+            if not result.is_complete:
+                _cancel_run(result)
+
+    metrics.finish()
+    if session.cancel_requested:
+        yield {"type": "cancelled"}
+    else:
+        session.history.append("assistant", response_text)
+        session.history.record_usage(result.raw_responses)
+        session.current_agent = result.last_agent
+    yield {
+        "type": "done",
+        "text": response_text,
+        "agent": session.current_agent.name,
+        "metrics": metrics.marks,
+    }
+
+
+async def run_turn_remote(base_url: str, session: ChatSession, user_input: str):
+    """Same events as `run_turn`, produced by a gateway (gateway.py) instead of in-process."""
+    session.history.append("user", user_input)
+    async with httpx.AsyncClient(base_url=base_url, timeout=httpx.Timeout(10, read=None)) as client:
+        async with client.stream(
+            "POST", f"/sessions/{session.session_id}/messages", json={"message": user_input}
+        ) as response:
+            if response.status_code != 200:
+                await response.aread()
+                yield {"type": "error", "message": response.json().get("detail", response.text)}
+                return
+            async for line in response.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                event = json.loads(line[len("data: "):])
+                if event["type"] == "done":
+                    session.history.append("assistant", event["text"])
+                    session.current_agent = agents_by_name.get(event["agent"], triage_agent)
+                yield event
@@ -0,0 +1,114 @@
+import hashlib
+import sqlite3
+import threading
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from cache import TTLCache
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that caches vectors by model name and text.
+
+    Lookups go to an in-memory LRU tier first, then to an sqlite file so that
+    vectors survive restarts, and only texts missing from both are sent to the
+    wrapped backend. Ingestion and queries share the same cache.
+    """
+
+    def __init__(self, embeddings: Embeddings, model_name: str, path: str, max_entries: int = 4096):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.path = path
+        self.memory = TTLCache(max_entries=max_entries)
+        self.disk_hits = 0
+        self.backend_calls = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, model TEXT, vector BLOB)"
+        )
+        self._db.commit()
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def _load(self, keys: list[str]) -> dict:
+        found = {}
+        with self._lock:
+            # stay well below sqlite's bound parameter limit
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                    batch,
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+
+    def _store(self, items: dict):
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, vector) VALUES (?, ?, ?)",
+                [
+                    (key, self.model_name, np.asarray(vector, dtype=np.float32).tobytes())
+                    for key, vector in items.items()
+                ],
+            )
+            self._db.commit()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        keys = [self._key(text) for text in texts]
+        vectors = {}
+        for key in set(keys):
+            vector = self.memory.get(key)
+            if vector is not None:
+                vectors[key] = vector
+
+        missing = [key for key in set(keys) if key not in vectors]
+        if missing:
+            on_disk = self._load(missing)
+            self.disk_hits += len(on_disk)
+            for key, vector in on_disk.items():
+                self.memory.set(key, vector)
+            vectors.update(on_disk)
+
+        to_embed = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                to_embed[key] = text
+        if to_embed:
+            self.backend_calls += 1
+            embedded = dict(zip(to_embed, self.embeddings.embed_documents(list(to_embed.values()))))
+            self._store(embedded)
+            for key, vector in embedded.items():
+                self.memory.set(key, vector)
+            vectors.update(embedded)
+
+        return [vectors[key] for key in keys]
+
+    def embed_query(self, text: str) -> list[float]:
+        key = self._key(text)
+        vector = self.memory.get(key)
+        if vector is not None:
+            return vector
+        on_disk = self._load([key])
+        if key in on_disk:
+            self.disk_hits += 1
+            vector = on_disk[key]
+        else:
+            self.backend_calls += 1
+            vector = self.embeddings.embed_query(text)
+            self._store({key: vector})
+        self.memory.set(key, vector)
+        return vector
+
+    def stats(self) -> dict:
+        memory = self.memory.stats()
+        return {
+            "memory_entries": memory["entries"],
+            "memory_hits": memory["hits"],
+            "disk_hits": self.disk_hits,
+            "backend_calls": self.backend_calls,
+        }
@@ -0,0 +1,70 @@
+from cache import TTLCache
+from config import config
+from http_client import flight_server
+
+
+class FlightSearchCache:
+    """
+    Short-lived cache of /flights/search results, keyed by route and by flight number.
+
+    Route searches also fill the per-flight entries, so the booking tools can check a
+    flight found in the same conversation without another request. Bookings and
+    amendments made through the tools call `invalidate_flight` so seat availability
+    is never served stale after our own writes.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl: float = 30):
+        self._entries = TTLCache(max_entries=max_entries, ttl=ttl)
+
+    @staticmethod
+    def route_key(from_city: str, to_city: str) -> tuple:
+        return ("route", from_city.strip().lower(), to_city.strip().lower())
+
+    @staticmethod
+    def flight_key(flight_number: str) -> tuple:
+        return ("flight", flight_number.strip().upper())
+
+    async def search_route(self, from_city: str, to_city: str) -> list:
+        key = self.route_key(from_city, to_city)
+        flights = self._entries.get(key)
+        if flights is None:
+            flights = await self._fetch(key, {"from_city": from_city, "to_city": to_city})
+            if isinstance(flights, list):
+                for flight in flights:
+                    self._entries.set(self.flight_key(flight["flight_number"]), [flight])
+        return flights
+
+    async def search_flight(self, flight_number: str) -> list:
+        key = self.flight_key(flight_number)
+        flights = self._entries.get(key)
+        if flights is None:
+            flights = await self._fetch(key, {"flight_number": flight_number})
+        return flights
+
+    async def _fetch(self, key: tuple, params: dict):
+        # the tools read seat availability from search results, flight_server leaves it out by default
+        response = await flight_server.get("/flights/search", params={**params, "include_seats": "true"})
+        flights = response.json()
+        # only successful lookups are cached, errors are retried on the next call
+        if response.status_code == 200:
+            self._entries.set(key, flights)
+        return flights
+
+    def invalidate_flight(self, flight_number: str):
+        """Drop the flight and every cached route search that lists it."""
+        self._entries.pop(self.flight_key(flight_number))
+        for key, flights in self._entries.items():
+            if key[0] == "route" and any(f.get("flight_number") == flight_number for f in flights):
+                self._entries.pop(key)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return self._entries.stats()
+
+
+flight_search_cache = FlightSearchCache(
+    max_entries=int(config.get("FLIGHT_CACHE_MAX_ENTRIES", 512)),
+    ttl=float(config.get("FLIGHT_CACHE_TTL", 30)),
+)
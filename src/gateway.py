@@ -0,0 +1,165 @@
+import asyncio
+import json
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+from config import config
+from conversation import ChatSession, run_turn
+from session_store import create_session_store
+from startup import warmup
+from model import model
+import telemetry
+
+# Headless entry point for the agents, run with: uvicorn gateway:app --port 8080
+# Every turn streams back as server-sent events; the Streamlit app can use it by setting GATEWAY_URL.
+
+app = FastAPI(title="Airline Agent Gateway")
+store = create_session_store()
+
+max_concurrent_turns = int(config.get("GATEWAY_MAX_CONCURRENT_TURNS", 64))
+max_queued_turns = int(config.get("GATEWAY_MAX_QUEUED_TURNS", 256))
+queue_timeout = float(config.get("GATEWAY_QUEUE_TIMEOUT", 30))
+turn_slots = asyncio.Semaphore(max_concurrent_turns)
+queued_turns = 0
+running_turns = {}  # session_id -> (task producing the turn's events, its session)
+
+
+class UserMessage(BaseModel):
+    message: str
+
+
+@app.on_event("startup")
+async def start_warmup():
+    telemetry.install(serve=False)
+    warmup()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return telemetry.render_metrics()
+
+
+@app.get("/slow-turns")
+async def slow_turns():
+    return list(telemetry.processor.slow_turn_log)
+
+
+@app.get("/healthz")
+async def healthz():
+    return {
+        "running_turns": len(running_turns),
+        "queued_turns": queued_turns,
+        "max_concurrent_turns": max_concurrent_turns,
+        "llm": model.resolve().stats() if hasattr(model.resolve(), "stats") else None,
+    }
+
+
+@app.post("/sessions")
+async def create_session():
+    session = ChatSession()
+    await store.save(session)
+    return {"session_id": session.session_id}
+
+
+@app.get("/sessions/{session_id}")
+async def get_session(session_id: str):
+    session = await store.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
+    return session.to_dict()
+
+
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    if session_id in running_turns:
+        # the cancelled turn must not save the session back once it is gone
+        running_turns[session_id][1].deleted = True
+    await cancel_turn(session_id)
+    await store.delete(session_id)
+    return {"deleted": session_id}
+
+
+@app.post("/sessions/{session_id}/cancel")
+async def cancel_turn(session_id: str):
+    # the turn's own session, a session started by its first message is only stored when the turn ends
+    task, session = running_turns.get(session_id, (None, None))
+    if task is None:
+        return {"cancelled": False}
+    session.cancel_requested = True
+    task.cancel()
+    return {"cancelled": True}
+
+
+async def acquire_turn_slot():
+    """Wait for a free turn slot, refusing new work once the wait queue is full."""
+    global queued_turns
+    if queued_turns >= max_queued_turns:
+        raise HTTPException(status_code=503, detail="Too many queued turns", headers={"Retry-After": "1"})
+    queued_turns += 1
+    try:
+        await asyncio.wait_for(turn_slots.acquire(), timeout=queue_timeout)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail="Timed out waiting for a turn slot", headers={"Retry-After": "1"})
+    finally:
+        queued_turns -= 1
+
+
+@app.post("/sessions/{session_id}/messages")
+async def post_message(session_id: str, body: UserMessage):
+    session = await store.get(session_id)
+    if session is None:
+        session = ChatSession(session_id)
+    if session.busy:
+        raise HTTPException(status_code=409, detail=f"Session {session_id} already has a turn running")
+    session.busy = True
+    try:
+        await acquire_turn_slot()
+    except HTTPException:
+        session.busy = False
+        raise
+
+    # the turn runs in its own task feeding a bounded queue: a slow client pauses the
+    # producer instead of buffering without limit, and the task can be cancelled
+    events = asyncio.Queue(maxsize=256)
+    disconnected = asyncio.Event()
+
+    async def emit(event):
+        # nobody drains the queue once the client is gone, a put on a full queue would never return
+        if not disconnected.is_set():
+            await events.put(event)
+
+    async def produce():
+        try:
+            async for event in run_turn(session, body.message):
+                await emit(event)
+        except asyncio.CancelledError:
+            await emit({"type": "cancelled"})
+        except Exception as e:
+            await emit({"type": "error", "message": str(e)})
+        finally:
+            # free the session and the slot before the last put, which waits on the client
+            try:
+                if not session.deleted:
+                    await store.save(session)
+            finally:
+                session.busy = False
+                if running_turns.get(session_id, (None,))[0] is turn:
+                    del running_turns[session_id]
+                turn_slots.release()
+            await emit(None)
+
+    turn = asyncio.create_task(produce())
+    running_turns[session_id] = (turn, session)
+
+    async def stream():
+        try:
+            while (event := await events.get()) is not None:
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            # client went away before the turn finished
+            disconnected.set()
+            if not turn.done():
+                session.cancel_requested = True
+                turn.cancel()
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
@@ -0,0 +1,109 @@
+import re
+from config import config
+
+_encoding = ...  # resolved on first use, None falls back to a character estimate
+
+# context fields that are plumbing rather than facts about the customer's trip
+_CONTEXT_EXCLUDE = {"mcp_config_path", "mcp_config"}
+
+
+def count_tokens(text: str) -> int:
+    global _encoding
+    if _encoding is ...:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception:  # tiktoken missing or its encoding files unavailable offline
+            _encoding = None
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+class ConversationHistory:
+    """
+    Chat transcript plus the bounded input that is sent to the agents each turn.
+
+    `messages` keeps every message for display. `build_input` sends the most
+    recent messages verbatim and folds older ones into a running extractive
+    summary once the prompt would exceed `token_budget`. Booking facts already
+    held in `AirlineAgentContext` are sent as one structured line instead of
+    relying on the turns that mentioned them.
+    """
+
+    def __init__(self, token_budget: int = None, keep_recent: int = None, summary_budget: int = None):
+        self.token_budget = token_budget or int(config.get("HISTORY_TOKEN_BUDGET", 3000))
+        self.keep_recent = keep_recent or int(config.get("HISTORY_KEEP_RECENT", 4))
+        self.summary_budget = summary_budget or int(config.get("HISTORY_SUMMARY_BUDGET", 500))
+        self.messages = []
+        self.summary_lines = []
+        self.folded = 0  # messages[:folded] live only in the summary
+        self.turn_stats = []
+
+    def append(self, role: str, content: str):
+        self.messages.append({"role": role, "content": content})
+
+    @staticmethod
+    def _summarize(message: dict) -> str:
+        text = re.sub(r"\s+", " ", message["content"]).strip()
+        first_sentence = re.split(r"(?<=[.?!])\s", text, maxsplit=1)[0]
+        if len(first_sentence) > 200:
+            first_sentence = first_sentence[:200].rstrip() + "..."
+        return f"{message['role']}: {first_sentence}"
+
+    @staticmethod
+    def _facts(context) -> str:
+        if context is None:
+            return ""
+        facts = {
+            key: value
+            for key, value in context.model_dump().items()
+            if value not in (None, [], "") and key not in _CONTEXT_EXCLUDE
+        }
+        return ", ".join(f"{key}={value}" for key, value in facts.items())
+
+    def _fold(self):
+        self.summary_lines.append(self._summarize(self.messages[self.folded]))
+        self.folded += 1
+        while len(self.summary_lines) > 1 and count_tokens("\n".join(self.summary_lines)) > self.summary_budget:
+            self.summary_lines.pop(0)  # the running summary keeps its most recent lines
+
+    def build_input(self, context=None) -> list[dict]:
+        """Input items for the next run; call after appending the user message."""
+        facts = self._facts(context)
+        prefix_tokens = count_tokens(facts) if facts else 0
+        recent_tokens = [count_tokens(m["content"]) for m in self.messages[self.folded:]]
+        while (
+            len(self.messages) - self.folded > self.keep_recent
+            and prefix_tokens + count_tokens("\n".join(self.summary_lines)) + sum(recent_tokens) > self.token_budget
+        ):
+            self._fold()
+            recent_tokens.pop(0)
+
+        items = []
+        if facts:
+            items.append({"role": "system", "content": f"Known booking details: {facts}"})
+        if self.summary_lines:
+            items.append(
+                {"role": "system", "content": "Summary of earlier conversation:\n" + "\n".join(self.summary_lines)}
+            )
+        items.extend(dict(m) for m in self.messages[self.folded:])
+
+        self.turn_stats.append(
+            {
+                "turn": len(self.turn_stats) + 1,
+                "messages_total": len(self.messages),
+                "messages_sent": len(self.messages) - self.folded,
+                "messages_folded": self.folded,
+                "prompt_tokens_estimated": sum(count_tokens(item["content"]) for item in items),
+            }
+        )
+        return items
+
+    def record_usage(self, raw_responses):
+        """Attach the provider-reported token usage of the finished turn to its stats."""
+        if self.turn_stats:
+            self.turn_stats[-1]["llm_calls"] = len(raw_responses)
+            self.turn_stats[-1]["input_tokens"] = sum(r.usage.input_tokens for r in raw_responses)
+            self.turn_stats[-1]["output_tokens"] = sum(r.usage.output_tokens for r in raw_responses)
+            print(f"Turn stats: {self.turn_stats[-1]}")
@@ -0,0 +1,131 @@
+import asyncio
+import random
+import threading
+import time
+import httpx
+from config import config
+from telemetry import span
+
+
+class FlightServerClient:
+    """
+    Shared async HTTP client for the flight_server API.
+
+    All tools go through one pooled keep-alive client so that a slow flight_server
+    response only suspends the calling coroutine instead of the whole event loop.
+    Every call gets a timeout, idempotent calls are retried with backoff and the
+    number of in-flight requests is capped by a semaphore.
+    """
+
+    RETRY_STATUS_CODES = {502, 503, 504}
+    # errors raised before the request reached the server, safe to retry for any method
+    CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+    def __init__(self):
+        self.base_url = config.get("FLIGHT_SERVER_URL", "http://flight_server:8000")
+        self.timeout = float(config.get("FLIGHT_SERVER_TIMEOUT", 10))
+        self.max_retries = int(config.get("FLIGHT_SERVER_MAX_RETRIES", 2))
+        self.retry_backoff = float(config.get("FLIGHT_SERVER_RETRY_BACKOFF", 0.2))
+        self.max_concurrency = int(config.get("FLIGHT_SERVER_MAX_CONCURRENCY", 20))
+        self._client = None
+        self._semaphore = None
+        self._loop = None
+        # callables receiving (method, path, status, seconds) after every call, status is
+        # the exception name when the call failed; used by the load test and metrics
+        self.observers = []
+
+    def _ensure_client(self):
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            # Streamlit runs every rerun in a fresh event loop and pooled connections
+            # are bound to the loop that opened them, so the pool follows the loop.
+            if self._client is not None:
+                self._close_on_loop(self._client, self._loop)
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                ),
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._client
+
+    @staticmethod
+    def _close_on_loop(client: httpx.AsyncClient, loop: asyncio.AbstractEventLoop):
+        """Close a client opened by another event loop on that loop, its connections can only be closed there."""
+        if loop.is_closed():
+            # too late for aclose(), the sockets go when the pool is garbage collected;
+            # code running a loop per request closes the client before the loop ends, see main.py
+            return
+        if loop.is_running():
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+        else:
+            closer = threading.Thread(target=loop.run_until_complete, args=(client.aclose(),), daemon=True)
+            closer.start()
+            closer.join(timeout=5)
+
+    async def request(self, method: str, path: str, timeout: float = None, **kwargs) -> httpx.Response:
+        with span("http", f"{method.upper()} {path}"):
+            if not self.observers:
+                return await self._request(method, path, timeout, **kwargs)
+            return await self._observed_request(method, path, timeout, **kwargs)
+
+    async def _observed_request(self, method: str, path: str, timeout: float = None, **kwargs) -> httpx.Response:
+        started = time.perf_counter()
+        status = None
+        try:
+            response = await self._request(method, path, timeout, **kwargs)
+            status = response.status_code
+            return response
+        except Exception as e:
+            status = type(e).__name__
+            raise
+        finally:
+            for observer in self.observers:
+                observer(method.upper(), path, status, time.perf_counter() - started)
+
+    async def _request(self, method: str, path: str, timeout: float = None, **kwargs) -> httpx.Response:
+        client = self._ensure_client()
+        idempotent = method.upper() in ("GET", "HEAD")
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    response = await client.request(
+                        method, path, timeout=timeout or self.timeout, **kwargs
+                    )
+                if not (idempotent and response.status_code in self.RETRY_STATUS_CODES):
+                    return response
+                if attempt >= self.max_retries:
+                    return response
+            except self.CONNECT_ERRORS:
+                if attempt >= self.max_retries:
+                    raise
+            except httpx.TransportError:
+                if not idempotent or attempt >= self.max_retries:
+                    raise
+            attempt += 1
+            await asyncio.sleep(self.retry_backoff * 2 ** (attempt - 1) * (0.5 + random.random()))
+
+    async def get(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", path, **kwargs)
+
+    async def put(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("PUT", path, **kwargs)
+
+    async def aclose(self):
+        if self._client is not None and self._loop is asyncio.get_running_loop():
+            await self._client.aclose()
+        elif self._client is not None:
+            self._close_on_loop(self._client, self._loop)
+        self._client = None
+        self._loop = None
+
+
+flight_server = FlightServerClient()
@@ -0,0 +1,293 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from fnmatch import fnmatch
+from pathlib import Path
+from langchain_community.document_loaders import TextLoader
+from langchain_text_splitters import MarkdownHeaderTextSplitter, RecursiveCharacterTextSplitter
+from telemetry import span
+
+
+class IngestionPipeline:
+    """
+    Streaming ingestion of a document tree into a Chroma collection.
+
+    Files are read one at a time, split on markdown headers and then by
+    characters, and the resulting chunks are grouped into batches. Batches
+    whose chunks are not stored yet are embedded on a bounded thread pool
+    while the calling thread writes finished batches to the collection, so
+    memory stays proportional to `batch_size * max_parallel` regardless of
+    the corpus size.
+
+    Chunk ids are content hashes, which makes every run incremental. A
+    journal of fully written files lets an interrupted run resume without
+    re-reading them, and chunks no longer produced by any file are deleted
+    at the end of a complete run.
+    """
+
+    headers_to_split_on = [
+        ("#", "Header 1"),
+        ("##", "Header 2"),
+    ]
+    chunk_size = 500
+    chunk_overlap = 30
+
+    def __init__(
+        self,
+        collection,
+        embeddings,
+        root: str,
+        glob=("**/*.txt", "**/*.md"),
+        exclude=("chroma_langchain_db/**",),
+        batch_size: int = 64,
+        max_parallel: int = 4,
+        journal_path: str = None,
+        progress_interval: float = 5.0,
+    ):
+        self.collection = collection
+        self.embeddings = embeddings
+        self.root = Path(root)
+        self.glob = glob
+        self.exclude = exclude
+        self.batch_size = batch_size
+        self.max_parallel = max_parallel
+        self.journal_path = journal_path
+        self.progress_interval = progress_interval
+        self.markdown_splitter = MarkdownHeaderTextSplitter(headers_to_split_on=self.headers_to_split_on)
+        self.text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=self.chunk_size, chunk_overlap=self.chunk_overlap
+        )
+
+    # -- stages -----------------------------------------------------------------------------
+
+    def iter_files(self):
+        seen = set()
+        for pattern in self.glob:
+            for path in sorted(self.root.glob(pattern)):
+                source = path.relative_to(self.root).as_posix()
+                if source in seen or not path.is_file():
+                    continue
+                if any(fnmatch(source, pattern) for pattern in self.exclude):
+                    continue
+                seen.add(source)
+                yield source, path
+
+    @staticmethod
+    def chunk_id(source: str, doc) -> str:
+        return hashlib.sha256(
+            "\0".join([source, repr(sorted(doc.metadata.items())), doc.page_content]).encode("utf-8")
+        ).hexdigest()
+
+    def split(self, source: str, path: Path):
+        for doc in TextLoader(str(path), encoding="utf-8").lazy_load():
+            md_header_splits = self.markdown_splitter.split_text(doc.page_content)
+            for split in self.text_splitter.split_documents(md_header_splits):
+                split.metadata["source"] = source
+                yield self.chunk_id(source, split), split
+
+    def embed(self, batch):
+        with span("embedding", "documents"):
+            return batch, self.embeddings.embed_documents([doc.page_content for _, doc in batch])
+
+    def write(self, batch, vectors):
+        with span("chroma", "upsert"):
+            self.collection.upsert(
+                ids=[chunk_id for chunk_id, _ in batch],
+                embeddings=vectors,
+                documents=[doc.page_content for _, doc in batch],
+                metadatas=[doc.metadata for _, doc in batch],
+            )
+
+    # -- journal ----------------------------------------------------------------------------
+
+    def load_journal(self) -> dict:
+        journal = {}
+        if self.journal_path and os.path.exists(self.journal_path):
+            with open(self.journal_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        break  # torn write from a crash, everything after it is redone
+                    journal[entry["source"]] = entry
+        return journal
+
+    def append_journal(self, entry: dict):
+        if self.journal_path:
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def compact_journal(self, entries: list[dict]):
+        if self.journal_path:
+            tmp_path = self.journal_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for entry in entries:
+                    f.write(json.dumps(entry) + "\n")
+            os.replace(tmp_path, self.journal_path)
+
+    def stored_ids(self, ids=None) -> set:
+        if ids is not None:
+            return set(self.collection.get(ids=ids, include=[])["ids"])
+        stored, offset, page = set(), 0, 10_000
+        while True:
+            batch = self.collection.get(include=[], limit=page, offset=offset)["ids"]
+            stored.update(batch)
+            if len(batch) < page:
+                return stored
+            offset += page
+
+    # -- driver -----------------------------------------------------------------------------
+
+    def run(self, full: bool = False) -> dict:
+        started = time.perf_counter()
+        stats = {"files": 0, "files_skipped": 0, "chunks": 0, "embedded": 0, "removed": 0}
+        journal = {} if full else self.load_journal()
+        completed = []  # journal entries for every file seen in this run
+        seen_ids = set()
+        files = {}  # source -> {"entry": ..., "pending": batches in flight, "split": done splitting}
+        in_flight = set()
+        batch = []
+        last_report = started
+
+        def finish_file(source):
+            state = files.pop(source)
+            self.append_journal(state["entry"])
+            completed.append(state["entry"])
+
+        def drain(block_until):
+            nonlocal last_report
+            while len(in_flight) > block_until:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    in_flight.discard(future)
+                    written, vectors = future.result()
+                    self.write(written, vectors)
+                    stats["embedded"] += len(written)
+                    for source in {doc.metadata["source"] for _, doc in written}:
+                        files[source]["pending"] -= 1
+                        if files[source]["split"] and files[source]["pending"] == 0:
+                            finish_file(source)
+            now = time.perf_counter()
+            if self.progress_interval and now - last_report >= self.progress_interval:
+                last_report = now
+                self.report(stats, now - started)
+
+        def flush(executor):
+            nonlocal batch
+            if not batch:
+                return
+            stored = self.stored_ids([chunk_id for chunk_id, _ in batch])
+            todo = [(chunk_id, doc) for chunk_id, doc in batch if chunk_id not in stored]
+            if todo:
+                for source in {doc.metadata["source"] for _, doc in todo}:
+                    files[source]["pending"] += 1
+                drain(self.max_parallel - 1)
+                in_flight.add(executor.submit(self.embed, todo))
+            batch = []
+
+        with ThreadPoolExecutor(max_workers=self.max_parallel, thread_name_prefix="ingest") as executor:
+            for source, path in self.iter_files():
+                stats["files"] += 1
+                sha256 = hashlib.sha256(path.read_bytes()).hexdigest()
+                previous = journal.get(source)
+                if previous and previous["sha256"] == sha256:
+                    stats["files_skipped"] += 1
+                    stats["chunks"] += len(previous["ids"])
+                    seen_ids.update(previous["ids"])
+                    completed.append(previous)
+                    continue
+
+                entry = {"source": source, "sha256": sha256, "ids": []}
+                files[source] = {"entry": entry, "pending": 0, "split": False}
+                for chunk_id, doc in self.split(source, path):
+                    if chunk_id in seen_ids:
+                        continue
+                    seen_ids.add(chunk_id)
+                    entry["ids"].append(chunk_id)
+                    stats["chunks"] += 1
+                    batch.append((chunk_id, doc))
+                    if len(batch) >= self.batch_size:
+                        flush(executor)
+                files[source]["split"] = True
+                if files[source]["pending"] == 0 and not any(
+                    doc.metadata["source"] == source for _, doc in batch
+                ):
+                    finish_file(source)
+            flush(executor)
+            drain(0)
+            for source in [s for s, state in files.items() if state["pending"] == 0]:
+                finish_file(source)
+
+        stale_ids = list(self.stored_ids().difference(seen_ids))
+        for i in range(0, len(stale_ids), self.batch_size):
+            self.collection.delete(ids=stale_ids[i:i + self.batch_size])
+        stats["removed"] = len(stale_ids)
+        self.compact_journal(completed)
+
+        stats["seconds"] = time.perf_counter() - started
+        stats["chunks_per_second"] = stats["chunks"] / stats["seconds"] if stats["seconds"] else 0.0
+        return stats
+
+    @staticmethod
+    def report(stats: dict, elapsed: float):
+        print(
+            f"ingest: {stats['files']} files ({stats['files_skipped']} unchanged), "
+            f"{stats['chunks']} chunks, {stats['embedded']} embedded, "
+            f"{stats['chunks'] / elapsed if elapsed else 0:.1f} chunks/s"
+        )
+
+
+def benchmark(num_files: int, batch_size: int, max_parallel: int, fake_embeddings: bool):
+    """Ingest a synthetic corpus into a throwaway collection and report chunks/sec."""
+    import tempfile
+    import chromadb
+
+    if fake_embeddings:
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+        embeddings = DeterministicFakeEmbedding(size=256)
+    else:
+        from config import config
+        embeddings = config.embeddings
+
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = Path(tmp, "corpus")
+        corpus.mkdir()
+        for i in range(num_files):
+            sections = "\n\n".join(
+                f"## Rule {i}.{j}\n\n" + " ".join(f"fare{i} rule{j} word{k}" for k in range(60))
+                for j in range(8)
+            )
+            Path(corpus, f"doc_{i:06d}.md").write_text(f"# Document {i}\n\n{sections}\n", encoding="utf-8")
+
+        collection = chromadb.PersistentClient(path=os.path.join(tmp, "db")).get_or_create_collection("benchmark")
+        pipeline = IngestionPipeline(
+            collection,
+            embeddings,
+            str(corpus),
+            batch_size=batch_size,
+            max_parallel=max_parallel,
+            journal_path=os.path.join(tmp, "journal.jsonl"),
+        )
+        cold = pipeline.run()
+        print(f"cold run: {cold['chunks']} chunks in {cold['seconds']:.2f}s -> {cold['chunks_per_second']:.1f} chunks/s")
+        warm = pipeline.run()
+        print(f"warm run: {warm['chunks']} chunks in {warm['seconds']:.2f}s -> {warm['chunks_per_second']:.1f} chunks/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest documents into the FAQ vector store.")
+    parser.add_argument("--batch-size", type=int, default=64, help="Chunks per embedding call and write.")
+    parser.add_argument("--parallel", type=int, default=4, help="Embedding batches in flight.")
+    parser.add_argument("--full", action="store_true", help="Ignore the journal and re-check every file.")
+    parser.add_argument("--benchmark", type=int, metavar="FILES", help="Benchmark on a synthetic corpus of FILES files.")
+    parser.add_argument("--fake-embeddings", action="store_true", help="Benchmark the pipeline without an embedding backend.")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.benchmark, args.batch_size, args.parallel, args.fake_embeddings)
+    else:
+        from chroma import get_client
+        print(get_client().reindex(full=args.full, batch_size=args.batch_size, max_parallel=args.parallel))
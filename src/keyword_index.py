@@ -0,0 +1,84 @@
+import math
+import re
+from collections import Counter, defaultdict
+
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i if in is it me my of on or "
+    "our the their there this to was what when where which who will with you your".split()
+)
+
+
+def stem(token: str) -> str:
+    # plural folding is enough for FAQ vocabulary ("infants" -> "infant", "bags" -> "bag")
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> list[str]:
+    return [stem(token) for token in re.findall(r"[a-z0-9]+", text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    In-process Okapi BM25 inverted index over the FAQ chunks.
+
+    `build` prepares a complete new index and swaps it in with a single
+    assignment, so searches running concurrently with a rebuild see either
+    the old or the new corpus, never a mix.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._index = ({}, [], [], [], 0.0)  # postings, ids, documents, lengths, avg length
+
+    def build(self, ids: list[str], documents: list[str]):
+        postings = defaultdict(list)  # term -> [(doc position, term frequency)]
+        lengths = []
+        for position, document in enumerate(documents):
+            tokens = tokenize(document)
+            lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                postings[term].append((position, tf))
+        avg_length = sum(lengths) / len(lengths) if lengths else 0.0
+        self._index = (dict(postings), list(ids), list(documents), lengths, avg_length)
+
+    def __len__(self):
+        return len(self._index[1])
+
+    def search(self, query: str, k: int = 10) -> list[tuple[str, str, float, float]]:
+        """
+        Return up to k (id, document, score, coverage) tuples, best first.
+
+        coverage is the fraction of distinct query terms found in the document.
+        """
+        postings, ids, documents, lengths, avg_length = self._index
+        terms = set(tokenize(query))
+        if not ids or not terms:
+            return []
+        scores = defaultdict(float)
+        matched = Counter()
+        for term in terms:
+            matches = postings.get(term)
+            if not matches:
+                continue
+            idf = math.log(1 + (len(ids) - len(matches) + 0.5) / (len(matches) + 0.5))
+            for position, tf in matches:
+                norm = self.k1 * (1 - self.b + self.b * lengths[position] / avg_length)
+                scores[position] += idf * tf * (self.k1 + 1) / (tf + norm)
+                matched[position] += 1
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [
+            (ids[position], documents[position], score, matched[position] / len(terms))
+            for position, score in best
+        ]
+
+
+def reciprocal_rank_fusion(*rankings: list[str], k: int = 60) -> list[str]:
+    """Merge several ranked id lists; ids ranked high in any list float to the top."""
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, item in enumerate(ranking):
+            scores[item] += 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
@@ -0,0 +1,113 @@
+import asyncio
+import threading
+from collections import deque
+
+
+class LimiterSaturated(Exception):
+    """No slot could be had: the wait queue is full or the deadline passed."""
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit that adapts to the backend with AIMD.
+
+    Every successful call whose latency stays within `tolerance` times the baseline
+    (the lowest recent latency) raises the limit by about one per round of calls;
+    slower calls shrink it by `latency_backoff` and overload responses (429/503)
+    by `overload_backoff`. Callers beyond the limit wait in a bounded FIFO queue
+    until a slot frees up or their deadline passes.
+    """
+
+    def __init__(
+        self,
+        initial: int = 8,
+        minimum: int = 1,
+        maximum: int = 64,
+        max_queue: int = 100,
+        tolerance: float = 2.0,
+        latency_backoff: float = 0.9,
+        overload_backoff: float = 0.5,
+    ):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.max_queue = max_queue
+        self.tolerance = tolerance
+        self.latency_backoff = latency_backoff
+        self.overload_backoff = overload_backoff
+        self.baseline = None
+        self.inflight = 0
+        self._waiters = deque()  # (loop, future) in arrival order
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def saturated(self) -> bool:
+        """True when a new caller would have to queue behind a full queue."""
+        with self._lock:
+            return self.inflight >= int(self.limit) and len(self._waiters) >= self.max_queue
+
+    async def acquire(self, timeout: float = None):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self.inflight < int(self.limit) and not self._waiters:
+                self.inflight += 1
+                return
+            if len(self._waiters) >= self.max_queue:
+                self.rejected += 1
+                raise LimiterSaturated(f"{len(self._waiters)} calls already waiting")
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+        try:
+            # the slot is handed over by release(), inflight is already counted for us
+            await asyncio.wait_for(asyncio.shield(waiter[1]), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                    granted = False
+                else:
+                    granted = True
+            if granted:
+                # the slot arrived while we gave up, pass it on
+                self.release()
+            if isinstance(e, asyncio.TimeoutError):
+                with self._lock:
+                    self.rejected += 1
+                raise LimiterSaturated(f"no slot within {timeout:.1f}s") from None
+            raise
+
+    def release(self, latency: float = None, overloaded: bool = False):
+        """Free a slot and adapt the limit to how the call went (no arguments: no signal)."""
+        with self._lock:
+            self.inflight -= 1
+            if overloaded:
+                self.limit = max(self.minimum, self.limit * self.overload_backoff)
+            elif latency is not None:
+                if self.baseline is None or latency < self.baseline:
+                    self.baseline = latency
+                else:
+                    # let the baseline drift up so one lucky fast call does not pin it forever
+                    self.baseline += (latency - self.baseline) * 0.01
+                if latency > self.tolerance * self.baseline:
+                    self.limit = max(self.minimum, self.limit * self.latency_backoff)
+                else:
+                    self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            while self._waiters and self.inflight < int(self.limit):
+                loop, future = self._waiters.popleft()
+                self.inflight += 1
+                loop.call_soon_threadsafe(_grant, future)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "limit": round(self.limit, 2),
+                "inflight": self.inflight,
+                "queued": len(self._waiters),
+                "baseline_latency": self.baseline,
+                "rejected": self.rejected,
+            }
+
+
+def _grant(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
@@ -0,0 +1,410 @@
+import argparse
+import asyncio
+import json
+import random
+import re
+import subprocess
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime
+import numpy as np
+from agents import Model, TracingProcessor, generation_span, set_trace_processors, set_tracing_disabled
+from openai.types.responses import ResponseFunctionToolCall, ResponseOutputMessage, ResponseOutputText
+from config import config
+from recorded_model import model_response, simulate_stream, text_deltas
+import telemetry
+
+# Load test of the whole agent stack against a running flight_server:
+#   python loadtest.py --customers 200 --concurrency 20 --fake-embeddings --output results.json
+# Customers follow scripted conversations (faq, search, book, amend) through run_turn, the
+# same path the chat UI and gateway use. A local stub stands in for the LLM unless --llm config
+# is given, in which case the configured model is used (MODEL_MODE=replay for offline runs).
+
+PASSENGERS = ["Jon Doe", "Ada Lovelace", "Alan Turing", "Grace Hopper", "Linus Torvalds", "Mary Shelley"]
+FAQ_QUESTIONS = [
+    "What is the baggage allowance?",
+    "Can I bring my pet on board?",
+    "Is there wifi on the plane?",
+    "How many seats are on the plane?",
+]
+
+# user message patterns the stub model understands, mapped to the tool that serves them
+INTENTS = [
+    ("update_flight_seat", re.compile(r"change (?:my )?seat to (?P<new_seat>\w+) for confirmation (?P<confirmation_number>\w+)", re.I)),
+    ("book_flight_seat", re.compile(r"book flight (?P<flight_number>FL\d+) for (?P<passenger_name>[^?.]+)", re.I)),
+    ("find_available_flights", re.compile(r"flights? from (?P<from_city>.+?) to (?P<to_city>[^?.]+)", re.I)),
+]
+
+
+REPORT_ORDER = ["conversation", "turn", "first_token", "agent", "llm", "tool", "handoff", "http"]
+
+
+class LatencyStats:
+    """Samples in seconds grouped by category (agent, tool, handoff, http, ...) and name."""
+
+    def __init__(self):
+        self.samples = defaultdict(lambda: defaultdict(list))
+        self.errors = defaultdict(lambda: defaultdict(int))
+
+    def add(self, category: str, name: str, seconds: float, error: bool = False):
+        self.samples[category][name].append(seconds)
+        if error:
+            self.errors[category][name] += 1
+
+    def summary(self, wall_seconds: float) -> dict:
+        result = {}
+        for category in sorted(self.samples, key=lambda c: REPORT_ORDER.index(c) if c in REPORT_ORDER else len(REPORT_ORDER)):
+            names = self.samples[category]
+            result[category] = {}
+            for name, values in sorted(names.items()):
+                values = np.array(values)
+                result[category][name] = {
+                    "count": len(values),
+                    "errors": self.errors[category][name],
+                    "per_second": round(len(values) / wall_seconds, 3),
+                    "mean": round(float(values.mean()), 4),
+                    "p50": round(float(np.percentile(values, 50)), 4),
+                    "p95": round(float(np.percentile(values, 95)), 4),
+                    "p99": round(float(np.percentile(values, 99)), 4),
+                    "max": round(float(values.max()), 4),
+                }
+        return result
+
+
+class SpanCollector(TracingProcessor):
+    """Turns agent, tool and handoff spans of the Agents SDK into latency samples."""
+
+    def __init__(self, stats: LatencyStats):
+        self.stats = stats
+
+    def on_span_end(self, span):
+        if not span.started_at or not span.ended_at:
+            return
+        seconds = (datetime.fromisoformat(span.ended_at) - datetime.fromisoformat(span.started_at)).total_seconds()
+        data = span.span_data
+        if data.type == "agent":
+            self.stats.add("agent", data.name, seconds, span.error is not None)
+        elif data.type == "function":
+            self.stats.add("tool", data.name, seconds, span.error is not None)
+        elif data.type == "handoff":
+            self.stats.add("handoff", f"{data.from_agent} -> {data.to_agent}", seconds, span.error is not None)
+
+    def on_trace_start(self, trace):
+        pass
+
+    def on_trace_end(self, trace):
+        pass
+
+    def on_span_start(self, span):
+        pass
+
+    def shutdown(self):
+        pass
+
+    def force_flush(self):
+        pass
+
+
+class StubModel(Model):
+    """
+    Rule-based stand-in for the LLM that drives the real agents, tools and handoffs.
+
+    For the latest user message it calls the matching tool when the current agent has it,
+    hands off to the agent that owns the tool otherwise, and answers with the tool output
+    once the tool has run. Responses are paced by `latency` and `token_delay`.
+    """
+
+    def __init__(self, tool_owners: dict, latency: float = 0.2, token_delay: float = 0.01):
+        self.tool_owners = tool_owners  # tool name -> agent name
+        self.latency = latency
+        self.token_delay = token_delay
+
+    @staticmethod
+    def _intent(text: str) -> tuple[str, dict]:
+        for tool, pattern in INTENTS:
+            match = pattern.search(text)
+            if match:
+                args = {name: value.strip() for name, value in match.groupdict().items()}
+                if tool == "book_flight_seat":
+                    args["no_of_seats"] = 1
+                return tool, args
+        return "faq_lookup_tool", {"question": text}
+
+    def _decide(self, input, tools, handoffs) -> list:
+        items = [{"role": "user", "content": input}] if isinstance(input, str) else input
+        last_user = max(i for i, item in enumerate(items) if item.get("role") == "user")
+        content = items[last_user]["content"]
+        text = content if isinstance(content, str) else " ".join(part.get("text", "") for part in content)
+        tool, args = self._intent(text)
+
+        tool_names = {getattr(t, "name", None) for t in tools}
+        calls = {
+            item["call_id"]: item["name"]
+            for item in items[last_user + 1:] if item.get("type") == "function_call"
+        }
+        outputs = [
+            item["output"] for item in items[last_user + 1:]
+            if item.get("type") == "function_call_output" and calls.get(item["call_id"]) in tool_names
+        ]
+        if outputs:
+            return [_message(str(outputs[-1])[:500])]
+        if tool in tool_names:
+            return [_function_call(tool, args)]
+        for handoff in handoffs:
+            if handoff.agent_name == self.tool_owners.get(tool):
+                return [_function_call(handoff.tool_name, {})]
+        return [_message("Sorry, I cannot help with that.")]
+
+    async def get_response(
+        self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing
+    ):
+        output = self._decide(input, tools, handoffs)
+        deltas = text_deltas(output)
+        with generation_span(model="stub", disabled=tracing.is_disabled()):
+            await asyncio.sleep(self.latency + self.token_delay * len(deltas))
+        return model_response(output, _usage(deltas))
+
+    async def stream_response(
+        self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing
+    ):
+        output = self._decide(input, tools, handoffs)
+        deltas = text_deltas(output)
+        with generation_span(model="stub", disabled=tracing.is_disabled()):
+            async for event in simulate_stream(output, _usage(deltas), deltas, self.latency, self.token_delay, "stub"):
+                yield event
+
+
+def _message(text: str) -> ResponseOutputMessage:
+    return ResponseOutputMessage(
+        id="__stub__",
+        content=[ResponseOutputText(text=text, type="output_text", annotations=[])],
+        role="assistant",
+        type="message",
+        status="completed",
+    )
+
+
+def _function_call(name: str, args: dict) -> ResponseFunctionToolCall:
+    return ResponseFunctionToolCall(
+        id="__stub__",
+        call_id=f"call_{uuid.uuid4().hex[:12]}",
+        arguments=json.dumps(args),
+        name=name,
+        type="function_call",
+    )
+
+
+def _usage(deltas: list) -> dict:
+    return {"input_tokens": 500, "output_tokens": len(deltas) + 10, "total_tokens": 510 + len(deltas)}
+
+
+class TimedModel(Model):
+    """Records the duration of every model call, by agent, around the model in use."""
+
+    def __init__(self, model: Model, stats: LatencyStats, agent_names: dict):
+        self.model = model
+        self.stats = stats
+        self.agent_names = agent_names  # instructions -> agent name
+
+    async def get_response(self, system_instructions, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await self.model.get_response(system_instructions, *args, **kwargs)
+        finally:
+            self.stats.add("llm", self.agent_names.get(system_instructions, "unknown"), time.perf_counter() - started)
+
+    async def stream_response(self, system_instructions, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            async for event in self.model.stream_response(system_instructions, *args, **kwargs):
+                yield event
+        finally:
+            self.stats.add("llm", self.agent_names.get(system_instructions, "unknown"), time.perf_counter() - started)
+
+
+def conversation_script(kind: str, flight: dict, rng: random.Random) -> list:
+    """Customer messages for one conversation; later messages may depend on the session so far."""
+    search = f"Find flights from {flight['departure_city']} to {flight['arrival_city']}"
+    book = f"Book flight {flight['flight_number']} for {rng.choice(PASSENGERS)}"
+    seat = rng.choice(flight["available_seats"])
+    scripts = {
+        "faq": [rng.choice(FAQ_QUESTIONS)],
+        "search": [search],
+        "book": [search, book],
+        "amend": [
+            search,
+            book,
+            lambda session: f"Change seat to {seat} for confirmation {session.context.confirmation_number}",
+        ],
+    }
+    return scripts[kind]
+
+
+async def run_customer(kind: str, flight: dict, rng: random.Random, stats: LatencyStats, think_time: float):
+    from conversation import ChatSession, run_turn
+
+    session = ChatSession()
+    started = time.perf_counter()
+    failed = False
+    for step, message in enumerate(conversation_script(kind, flight, rng)):
+        if step and think_time:
+            await asyncio.sleep(think_time)
+        if callable(message):
+            message = message(session)
+        turn_started = time.perf_counter()
+        first_token = None
+        error = False
+        try:
+            async for event in run_turn(session, message):
+                if event["type"] == "token" and first_token is None:
+                    first_token = time.perf_counter() - turn_started
+                elif event["type"] == "error":
+                    error = True
+        except Exception as e:
+            print(f"{kind} conversation failed: {type(e).__name__}: {e}")
+            error = True
+        stats.add("turn", kind, time.perf_counter() - turn_started, error)
+        if first_token is not None:
+            stats.add("first_token", kind, first_token)
+        failed = failed or error
+        if error:
+            break
+    stats.add("conversation", kind, time.perf_counter() - started, failed)
+
+
+async def load_test(
+    customers: int,
+    concurrency: int,
+    mix: dict,
+    think_time: float,
+    seed: int,
+    stats: LatencyStats,
+) -> float:
+    from http_client import flight_server
+
+    rng = random.Random(seed)
+    catalog = [f for f in (await flight_server.get("/flights/list", params={"include_seats": "true", "limit": 1000})).json() if f.get("available_seats")]
+    if not catalog:
+        raise SystemExit("flight_server has no flights with available seats, seed the database first")
+
+    set_tracing_disabled(False)
+    set_trace_processors([SpanCollector(stats), telemetry.processor])
+    flight_server.observers.append(
+        lambda method, path, status, seconds: stats.add(
+            "http", f"{method} {path}", seconds, not isinstance(status, int) or status >= 500
+        )
+    )
+
+    kinds = rng.choices(list(mix), weights=list(mix.values()), k=customers)
+    slots = asyncio.Semaphore(concurrency)
+
+    async def customer(kind: str):
+        async with slots:
+            await run_customer(kind, rng.choice(catalog), random.Random(rng.random()), stats, think_time)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(customer(kind) for kind in kinds))
+    return time.perf_counter() - started
+
+
+def install_model(llm: str, stats: LatencyStats, stub_latency: float, stub_token_delay: float):
+    from model import model
+    from agent_def import triage_agent, routes
+
+    agents = [triage_agent, *routes.values()]
+    agent_names = {agent.instructions: agent.name for agent in agents}
+    if llm == "stub":
+        tool_owners = {tool.name: agent.name for agent in agents for tool in agent.tools}
+        inner = StubModel(tool_owners, latency=stub_latency, token_delay=stub_token_delay)
+    else:
+        inner = model.resolve()
+    model.use(TimedModel(inner, stats, agent_names))
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(results: dict, baseline: dict = None):
+    print(
+        f"\n{results['conversations']} conversations in {results['wall_seconds']:.1f}s: "
+        f"{results['throughput']['conversations_per_second']:.2f} conversations/s, "
+        f"{results['throughput']['turns_per_second']:.2f} turns/s"
+    )
+    for category, names in results["latency"].items():
+        print(f"\n{category:<48}{'count':>7}{'err':>5}{'p50':>9}{'p95':>9}{'p99':>9}")
+        for name, s in names.items():
+            line = f"  {name:<46}{s['count']:>7}{s['errors']:>5}{s['p50']:>9.3f}{s['p95']:>9.3f}{s['p99']:>9.3f}"
+            before = (baseline or {}).get("latency", {}).get(category, {}).get(name)
+            if before and before["p95"]:
+                line += f"  p95 {(s['p95'] - before['p95']) / before['p95']:+.0%}"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the agents against a running flight_server.")
+    parser.add_argument("--customers", type=int, default=100, help="Number of scripted conversations.")
+    parser.add_argument("--concurrency", type=int, default=10, help="Conversations running at the same time.")
+    parser.add_argument("--mix", default="faq=1,search=1,book=1,amend=1", help="Relative weight of each conversation kind.")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Seconds a customer waits between messages.")
+    parser.add_argument("--llm", choices=("stub", "config"), default="stub", help="Local stub LLM or the configured model.")
+    parser.add_argument("--stub-latency", type=float, default=0.2, help="Stub seconds before the first token.")
+    parser.add_argument("--stub-token-delay", type=float, default=0.01, help="Stub seconds between streamed tokens.")
+    parser.add_argument("--fake-embeddings", action="store_true", help="Answer FAQs from a throwaway index with fake embeddings.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="loadtest-results.json", help="Where to write the JSON results.")
+    parser.add_argument("--baseline", help="Earlier results file to compare p95 latencies against.")
+    args = parser.parse_args()
+
+    if args.fake_embeddings:
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+        config._embeddings = DeterministicFakeEmbedding(size=256)
+        config.env_vars["CHROMADB_PATH"] = tempfile.mkdtemp(prefix="loadtest-chroma-")
+
+    mix = {kind: float(weight) for kind, weight in (part.split("=") for part in args.mix.split(","))}
+    stats = LatencyStats()
+    install_model(args.llm, stats, args.stub_latency, args.stub_token_delay)
+    # build the FAQ index before the clock starts
+    from chroma import get_client
+    get_client()
+
+    wall = asyncio.run(load_test(args.customers, args.concurrency, mix, args.think_time, args.seed, stats))
+    from flight_cache import flight_search_cache
+
+    turns = sum(len(v) for v in stats.samples["turn"].values())
+    results = {
+        "commit": git_commit(),
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "args": vars(args),
+        "conversations": args.customers,
+        "wall_seconds": round(wall, 3),
+        "throughput": {
+            "conversations_per_second": round(args.customers / wall, 3),
+            "turns_per_second": round(turns / wall, 3),
+        },
+        "latency": stats.summary(wall),
+        "time_attribution_seconds": {
+            labels[0]: round(seconds, 3) for labels, seconds in telemetry.turn_attributed_seconds.values().items()
+        },
+        "slow_turns": sum(telemetry.slow_turns.values().values()),
+        "flight_search_cache": flight_search_cache.stats(),
+    }
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
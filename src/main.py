@@ -1,27 +1,35 @@
 
 import asyncio, time
 import streamlit as st
-import uuid
-import re
-from model import AirlineAgentContext
-from agent_def import triage_agent
-from agents import Runner, ItemHelpers, trace, set_tracing_disabled
-from openai import APITimeoutError
+from startup import timed, warmup
+from config import config
+with timed("import conversation"):
+    from conversation import ChatSession, run_turn, run_turn_remote, strip_think
+from turn_metrics import summarize
+from http_client import flight_server
+import telemetry
+from agents import set_tracing_disabled
 # from langsmith.wrappers import OpenAIAgentsTracingProcessor
 
+# With GATEWAY_URL set the agents run in the gateway (gateway.py) and this app is only a client of it
+gateway_url = config.get("GATEWAY_URL", "")
+
+# Build clients and the FAQ index in the background while the first message is typed
+if not gateway_url:
+    telemetry.install()
+    warmup()
+
 # Initialize Streamlit app
 st.title("Airline Agent Chatbot")
 st.write("Type your message below and interact with the AI assistant.")
 
 # Session state for conversation tracking
-if "conversation_id" not in st.session_state:
-    st.session_state.conversation_id = uuid.uuid4().hex[:16]
-    st.session_state.messages = []
-    st.session_state.current_agent = triage_agent
-    st.session_state.context = AirlineAgentContext()
+if "session" not in st.session_state:
+    st.session_state.session = ChatSession()
+
 
 # Display previous chat messages
-for message in st.session_state.messages:
+for message in st.session_state.session.history.messages:
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
 
@@ -30,52 +38,60 @@ async def main():
     user_input = st.chat_input("Enter your message")
 
     if user_input:
-        st.session_state.messages.append({"content": user_input, "role": "user"})
+        session = st.session_state.session
         with st.chat_message("user"):
             st.markdown(user_input)
-        
-        with trace('FlightAgent'):
-            result = Runner.run_streamed(
-                st.session_state.current_agent,
-                st.session_state.messages,
-                context=st.session_state.context,
-            )
-            
-            response_text = "Typing"
-            # Placeholder for assistant response
-            # Show "typing..." indicator
-            with st.chat_message("assistant"):
-                typing_placeholder = st.empty()
-                typing_placeholder.markdown(f"_{response_text}_")
-
-            try:
-
-                async for event in result.stream_events():
-                    if event.type == "raw_response_event":
-                        continue
-                    elif event.type == "agent_updated_stream_event":
-                        st.session_state.current_agent = event.new_agent
-                        continue
-                    elif event.type == "run_item_stream_event":
-                        if event.item.type == "tool_call_item":
-                            response_text = f"-- Tool was called by {event.item.agent.name}"
-                        elif event.item.type == "tool_call_output_item":
-                            response_text = f"🔴 Tool output {event.item.output[:20]}..."
-                            print(f"Tool output {event.item.output}")
-                        elif event.item.type == "handoff_output_item":
-                            response_text = f"🟡 Handoff '{event.item.source_agent.name}' -> '{event.item.target_agent.name}'"
-                        elif event.item.type == "message_output_item":
-                            response_text = re.sub(r'<think>.*?</think>\s*', '', ItemHelpers.text_message_output(event.item), flags=re.DOTALL)
-                        typing_placeholder.markdown(response_text)
-                    await asyncio.sleep(0.5)
-            except APITimeoutError:
-                response_text = "Unable to reach AI"
-
-            st.session_state.messages.append({"role": "assistant", "content": response_text})
-            st.session_state.current_agent = result.last_agent
-        
-        
+
+        response_text = "Typing"
+        # Placeholder for assistant response
+        # Show "typing..." indicator
+        with st.chat_message("assistant"):
+            typing_placeholder = st.empty()
+            typing_placeholder.markdown(f"_{response_text}_")
+            metrics_placeholder = st.empty()
+
+        if gateway_url:
+            events = run_turn_remote(gateway_url, session, user_input)
+        else:
+            events = run_turn(session, user_input)
+
+        streamed_text = ""
+        last_render = 0.0
+        async for event in events:
+            if event["type"] == "token":
+                streamed_text += event["delta"]
+                # re-render at most every 50ms, the websocket cannot keep up with every token
+                if time.perf_counter() - last_render > 0.05:
+                    last_render = time.perf_counter()
+                    typing_placeholder.markdown(strip_think(streamed_text) or f"_{response_text}_")
+                continue
+            elif event["type"] == "tool_call":
+                response_text = f"-- Tool was called by {event['agent']}"
+            elif event["type"] == "tool_output":
+                response_text = f"🔴 Tool output {event['output'][:20]}..."
+            elif event["type"] == "handoff":
+                response_text = f"🟡 Handoff '{event['source']}' -> '{event['target']}'"
+            elif event["type"] in ("message", "done"):
+                response_text = event["text"]
+            elif event["type"] == "error":
+                response_text = event["message"]
+            else:
+                continue
+            streamed_text = ""
+            typing_placeholder.markdown(response_text)
+            if event["type"] == "done" and "metrics" in event:
+                metrics_placeholder.caption(summarize(event["metrics"]))
+
+
+async def rerun():
+    try:
+        await main()
+    finally:
+        # the connection pool belongs to this rerun's event loop, close it before asyncio.run closes the loop
+        await flight_server.aclose()
+
+
 if __name__ == "__main__":
     # set_trace_processors([OpenAIAgentsTracingProcessor()])
     # set_tracing_disabled(True)
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(rerun())
@@ -1,12 +1,17 @@
-from agents import OpenAIChatCompletionsModel
+import threading
+from agents import Model, OpenAIChatCompletionsModel
 from pydantic import BaseModel
 from config import config
+from recorded_model import ModelRecording, RecordingModel, ReplayModel
+from resilient_model import ResilientModel
+from limiter import AdaptiveLimiter
 
 
 class AirlineAgentContext(BaseModel):
     passenger_name: str | None = None
     confirmation_number: str | None = None
     seat_number: str | None = None
+    seat_numbers: list[str] | None = None
     flight_number: str | None = None
     from_city: str | None = None
     to_city: str | None = None
@@ -15,7 +20,78 @@ class AirlineAgentContext(BaseModel):
 
 
 
-model = OpenAIChatCompletionsModel(
-    model=config.model_name,
-    openai_client=config.llm_client,
-)
\ No newline at end of file
+class LazyModel(Model):
+    """Model that builds the wrapped model, and with it the LLM client, on first use."""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._model = None
+        self._lock = threading.Lock()
+
+    def resolve(self) -> Model:
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = self._factory()
+        return self._model
+
+    def use(self, model: Model):
+        """Replace the wrapped model, e.g. with a stub for load tests."""
+        with self._lock:
+            self._model = model
+
+    async def get_response(self, *args, **kwargs):
+        return await self.resolve().get_response(*args, **kwargs)
+
+    def stream_response(self, *args, **kwargs):
+        return self.resolve().stream_response(*args, **kwargs)
+
+
+def _build_model() -> Model:
+    if config.model_mode == "replay":
+        # no LLM client is built, replay runs without network access
+        return ReplayModel(
+            ModelRecording(config.model_recording_path),
+            latency=config.get("MODEL_REPLAY_LATENCY", "recorded"),
+            token_delay=float(config.get("MODEL_REPLAY_TOKEN_DELAY")) if config.get("MODEL_REPLAY_TOKEN_DELAY") else None,
+        )
+    live = OpenAIChatCompletionsModel(
+        model=config.model_name,
+        openai_client=config.llm_client,
+    )
+    if config.llm_resilience:
+        live = _resilient(live)
+    if config.model_mode == "record":
+        return RecordingModel(live, ModelRecording(config.model_recording_path))
+    return live
+
+
+def _limiter() -> AdaptiveLimiter:
+    return AdaptiveLimiter(
+        initial=int(config.get("LLM_CONCURRENCY_INITIAL", 8)),
+        maximum=int(config.get("LLM_CONCURRENCY_MAX", 64)),
+        max_queue=int(config.get("LLM_MAX_QUEUE", 100)),
+    )
+
+
+def _resilient(primary: Model) -> Model:
+    fallback = None
+    if config.get("LLM_FALLBACK_MODEL") or config.get("LLM_FALLBACK_BASE_URL"):
+        # a second model on the same endpoint, or the same model on a second endpoint
+        fallback = OpenAIChatCompletionsModel(
+            model=config.get("LLM_FALLBACK_MODEL") or config.model_name,
+            openai_client=config.fallback_llm_client or config.llm_client,
+        )
+    return ResilientModel(
+        primary,
+        fallback=fallback,
+        limiter=_limiter(),
+        fallback_limiter=_limiter(),
+        queue_timeout=float(config.get("LLM_QUEUE_TIMEOUT", 30)),
+        max_retries=int(config.get("LLM_MAX_RETRIES", 2)),
+        retry_backoff=float(config.get("LLM_RETRY_BACKOFF", 0.5)),
+        coalesce=config.get("LLM_COALESCE", "True").lower() == "true",
+    )
+
+
+model = LazyModel(_build_model)
\ No newline at end of file
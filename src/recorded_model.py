@@ -0,0 +1,291 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from agents import Model, ModelResponse, Usage, generation_span
+from openai.types.responses import (
+    Response,
+    ResponseCompletedEvent,
+    ResponseCreatedEvent,
+    ResponseOutputItem,
+    ResponseTextDeltaEvent,
+    ResponseUsage,
+)
+from pydantic import TypeAdapter
+
+_output_item = TypeAdapter(ResponseOutputItem)
+
+
+class ReplayMissError(LookupError):
+    """Replay mode got a request that is not in the recording."""
+
+
+def request_keys(system_instructions, input, tools, output_schema, handoffs) -> tuple[str, str]:
+    """
+    Exact and loose keys for one model request.
+
+    The exact key covers everything the model sees. The loose key keeps the agent,
+    its tools and the user messages but ignores tool results and system notes, so a
+    recording still matches when the flight server hands out different seats or
+    confirmation numbers than it did while recording.
+    """
+    agent = {
+        "instructions": system_instructions,
+        "tools": sorted(getattr(tool, "name", type(tool).__name__) for tool in tools),
+        "handoffs": sorted(handoff.tool_name for handoff in handoffs),
+        "output": output_schema.output_type_name() if output_schema else None,
+    }
+    items = [{"role": "user", "content": input}] if isinstance(input, str) else input
+    shape = [
+        (item.get("type", "message"), item.get("role"), item.get("content") if item.get("role") == "user" else None)
+        for item in items
+    ]
+
+    def digest(payload) -> str:
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+    return digest({**agent, "input": items}), digest({**agent, "input": shape})
+
+
+class ModelRecording:
+    """
+    Request/response pairs kept in a JSON lines file, one model call per line.
+
+    Identical requests recorded several times are replayed in recording order,
+    starting over once they run out.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._by_key = defaultdict(list)
+        self._by_shape = defaultdict(list)
+        self._served = defaultdict(int)
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        self._index(json.loads(line))
+
+    def __len__(self) -> int:
+        return sum(len(records) for records in self._by_key.values())
+
+    def _index(self, record: dict):
+        self._by_key[record["key"]].append(record)
+        self._by_shape[record["shape"]].append(record)
+
+    def add(self, record: dict):
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, default=str) + "\n")
+            self._index(record)
+
+    def find(self, key: str, shape: str) -> dict | None:
+        with self._lock:
+            for kind, index, lookup in (("key", self._by_key, key), ("shape", self._by_shape, shape)):
+                records = index.get(lookup)
+                if records:
+                    served = self._served[(kind, lookup)]
+                    self._served[(kind, lookup)] += 1
+                    return records[served % len(records)]
+        return None
+
+
+def text_deltas(output) -> list[str]:
+    # stand-in for token deltas when a response was recorded without streaming
+    text = "".join(
+        part.text for item in output if item.type == "message"
+        for part in item.content if part.type == "output_text"
+    )
+    if not text:
+        return []
+    words = text.split(" ")
+    return [word + " " for word in words[:-1]] + words[-1:]
+
+
+class RecordingModel(Model):
+    """Passes every call to `model` and appends the request and its response to `recording`."""
+
+    def __init__(self, model: Model, recording: ModelRecording):
+        self.model = model
+        self.recording = recording
+
+    def _save(self, request: tuple, output, usage: dict, latency: float, first_token: float, deltas: list):
+        key, shape = request_keys(*request)
+        self.recording.add({
+            "key": key,
+            "shape": shape,
+            "agent_instructions": (request[0] or "")[:80],
+            "output": [item.model_dump() for item in output],
+            "usage": usage,
+            "latency": latency,
+            "first_token_latency": first_token,
+            "deltas": deltas,
+        })
+
+    async def get_response(
+        self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing
+    ) -> ModelResponse:
+        started = time.perf_counter()
+        response = await self.model.get_response(
+            system_instructions, input, model_settings, tools, output_schema, handoffs, tracing
+        )
+        latency = time.perf_counter() - started
+        self._save(
+            (system_instructions, input, tools, output_schema, handoffs),
+            response.output,
+            {
+                "input_tokens": response.usage.input_tokens,
+                "output_tokens": response.usage.output_tokens,
+                "total_tokens": response.usage.total_tokens,
+            },
+            latency,
+            latency,
+            text_deltas(response.output),
+        )
+        return response
+
+    async def stream_response(
+        self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing
+    ):
+        started = time.perf_counter()
+        first_token = None
+        deltas = []
+        async for event in self.model.stream_response(
+            system_instructions, input, model_settings, tools, output_schema, handoffs, tracing
+        ):
+            if isinstance(event, ResponseTextDeltaEvent):
+                if first_token is None:
+                    first_token = time.perf_counter() - started
+                deltas.append(event.delta)
+            elif isinstance(event, ResponseCompletedEvent):
+                latency = time.perf_counter() - started
+                self._save(
+                    (system_instructions, input, tools, output_schema, handoffs),
+                    event.response.output,
+                    event.response.usage.model_dump() if event.response.usage else None,
+                    latency,
+                    latency if first_token is None else first_token,
+                    deltas or text_deltas(event.response.output),
+                )
+            yield event
+
+
+class ReplayModel(Model):
+    """
+    Serves responses from a recording without any network access.
+
+    `latency` is either "recorded", to wait as long as the original call took, or a
+    fixed number of seconds per response. Streamed text is spread over that time in
+    the recorded deltas, or `token_delay` seconds apart when given.
+    """
+
+    def __init__(self, recording: ModelRecording, latency="recorded", token_delay: float = None):
+        self.recording = recording
+        self.latency = latency
+        self.token_delay = token_delay
+
+    def _lookup(self, system_instructions, input, tools, output_schema, handoffs) -> dict:
+        key, shape = request_keys(system_instructions, input, tools, output_schema, handoffs)
+        record = self.recording.find(key, shape)
+        if record is None:
+            raise ReplayMissError(
+                f"No recorded response for this request to agent '{(system_instructions or '')[:60]}', "
+                f"record it first with MODEL_MODE=record ({self.recording.path})"
+            )
+        return record
+
+    def _timings(self, record: dict) -> tuple[float, float]:
+        """Seconds before the first delta and between deltas."""
+        if self.latency == "recorded":
+            total, first = record["latency"], record["first_token_latency"]
+        else:
+            total = first = float(self.latency)
+        if self.token_delay is not None:
+            return first, self.token_delay
+        return first, max(total - first, 0) / max(len(record["deltas"]), 1)
+
+    async def get_response(
+        self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing
+    ) -> ModelResponse:
+        record = self._lookup(system_instructions, input, tools, output_schema, handoffs)
+        first, per_delta = self._timings(record)
+        with generation_span(model="replay", disabled=tracing.is_disabled()):
+            await asyncio.sleep(first + per_delta * len(record["deltas"]))
+        return model_response(
+            [_output_item.validate_python(item) for item in record["output"]], record["usage"]
+        )
+
+    async def stream_response(
+        self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing
+    ):
+        record = self._lookup(system_instructions, input, tools, output_schema, handoffs)
+        first, per_delta = self._timings(record)
+        with generation_span(model="replay", disabled=tracing.is_disabled()):
+            async for event in simulate_stream(
+                [_output_item.validate_python(item) for item in record["output"]],
+                record["usage"],
+                record["deltas"],
+                first,
+                per_delta,
+            ):
+                yield event
+
+
+def _response_usage(usage: dict | None) -> dict:
+    return {
+        "input_tokens_details": {"cached_tokens": 0},
+        "output_tokens_details": {"reasoning_tokens": 0},
+        **(usage or {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}),
+    }
+
+
+def model_response(output: list, usage: dict | None) -> ModelResponse:
+    """`ModelResponse` for output items that were not produced by a live call."""
+    usage = _response_usage(usage)
+    return ModelResponse(
+        output=output,
+        usage=Usage(
+            requests=1,
+            input_tokens=usage["input_tokens"],
+            output_tokens=usage["output_tokens"],
+            total_tokens=usage["total_tokens"],
+        ),
+        referenceable_id=None,
+    )
+
+
+async def simulate_stream(
+    output: list, usage: dict | None, deltas: list[str], first_delay: float, delta_delay: float, model_name: str = "replay"
+):
+    """Stream events for an already known response, paced like a live model."""
+    response = Response(
+        id="__replayed__",
+        created_at=time.time(),
+        model=model_name,
+        object="response",
+        output=[],
+        tool_choice="auto",
+        tools=[],
+        parallel_tool_calls=False,
+    )
+    yield ResponseCreatedEvent(response=response, type="response.created")
+    await asyncio.sleep(first_delay)
+    for index, delta in enumerate(deltas):
+        if index:
+            await asyncio.sleep(delta_delay)
+        yield ResponseTextDeltaEvent(
+            content_index=0,
+            delta=delta,
+            item_id="__replayed__",
+            output_index=0,
+            type="response.output_text.delta",
+        )
+    final_response = response.model_copy()
+    final_response.output = output
+    final_response.usage = ResponseUsage.model_validate(_response_usage(usage))
+    yield ResponseCompletedEvent(response=final_response, type="response.completed")
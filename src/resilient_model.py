@@ -0,0 +1,263 @@
+import asyncio
+import random
+import time
+from agents import Model
+from openai import APIConnectionError, APIStatusError, APITimeoutError, RateLimitError
+from limiter import AdaptiveLimiter, LimiterSaturated
+from recorded_model import request_keys
+
+
+class LLMOverloadedError(Exception):
+    """Neither the primary nor the fallback model could take the call in time."""
+
+
+def _overloaded(error: Exception) -> bool:
+    return isinstance(error, RateLimitError) or (
+        isinstance(error, APIStatusError) and error.status_code in (503, 529)
+    )
+
+
+def _retryable(error: Exception) -> bool:
+    return isinstance(error, (APIConnectionError, APITimeoutError)) or _overloaded(error) or (
+        isinstance(error, APIStatusError) and error.status_code >= 500
+    )
+
+
+class _SharedCall:
+    """
+    One backend call shared by identical requests in flight.
+
+    The call runs in its own task, so a caller that is cancelled only stops waiting and
+    the others keep the call; it is cancelled once the last caller has left.
+    """
+
+    def __init__(self, inflight: dict, key):
+        self.inflight = inflight
+        self.key = key
+        self.callers = 0
+        self.task = None
+
+    def start(self, coro):
+        self.inflight[self.key] = self
+        self.task = asyncio.ensure_future(coro)
+        self.task.add_done_callback(self._done)
+        return self
+
+    def _done(self, task):
+        self._forget()
+        if not task.cancelled():
+            task.exception()  # the callers get the error, no "never retrieved" warning
+
+    def _forget(self):
+        if self.inflight.get(self.key) is self:
+            del self.inflight[self.key]
+
+    def join(self):
+        self.callers += 1
+
+    def leave(self):
+        self.callers -= 1
+        if self.callers == 0 and not self.task.done():
+            # identical requests arriving from now on start a call of their own
+            self._forget()
+            self.task.cancel()
+
+
+class _Broadcast(_SharedCall):
+    """Events of one in-flight streamed call, replayed to identical callers that join late."""
+
+    def __init__(self, inflight: dict, key):
+        super().__init__(inflight, key)
+        self.events = []
+        self.done = False
+        self.error = None
+        self._changed = asyncio.Event()
+
+    def publish(self, event=None, done: bool = False, error: Exception = None):
+        if event is not None:
+            self.events.append(event)
+        self.done = self.done or done
+        self.error = self.error or error
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def follow(self):
+        self.join()
+        try:
+            index = 0
+            while True:
+                if index < len(self.events):
+                    index += 1
+                    yield self.events[index - 1]
+                elif self.done:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                else:
+                    await self._changed.wait()
+        finally:
+            self.leave()
+
+
+class ResilientModel(Model):
+    """
+    Guards a shared LLM backend against fan-out from many sessions.
+
+    Calls pass an adaptive concurrency limit (AIMD on latency and 429s) with a bounded
+    wait queue and a deadline, are retried with jittered backoff on transient errors,
+    and identical requests already in flight share one backend call. When the primary
+    is saturated and a `fallback` model is configured, calls go there instead.
+    """
+
+    def __init__(
+        self,
+        primary: Model,
+        fallback: Model = None,
+        limiter: AdaptiveLimiter = None,
+        fallback_limiter: AdaptiveLimiter = None,
+        queue_timeout: float = 30,
+        max_retries: int = 2,
+        retry_backoff: float = 0.5,
+        coalesce: bool = True,
+    ):
+        self.primary = primary
+        self.fallback = fallback
+        self.limiter = limiter or AdaptiveLimiter()
+        self.fallback_limiter = fallback_limiter or AdaptiveLimiter()
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.coalesce = coalesce
+        self._inflight = {}  # (loop, key) -> _SharedCall or _Broadcast of the call being made
+        self.counts = {"calls": 0, "coalesced": 0, "retries": 0, "fallback": 0}
+
+    def _key(self, stream: bool, system_instructions, input, model_settings, tools, output_schema, handoffs):
+        key, _ = request_keys(system_instructions, input, tools, output_schema, handoffs)
+        return (asyncio.get_running_loop(), stream, key, repr(model_settings))
+
+    async def _slot(self, deadline: float) -> tuple[Model, AdaptiveLimiter]:
+        """Wait for the primary, or go straight to the fallback when the primary is saturated."""
+        if self.fallback is not None and self.limiter.saturated():
+            self.counts["fallback"] += 1
+            await self._acquire(self.fallback_limiter, deadline)
+            return self.fallback, self.fallback_limiter
+        try:
+            await self._acquire(self.limiter, deadline)
+            return self.primary, self.limiter
+        except LLMOverloadedError:
+            if self.fallback is None:
+                raise
+            self.counts["fallback"] += 1
+            await self._acquire(self.fallback_limiter, deadline)
+            return self.fallback, self.fallback_limiter
+
+    @staticmethod
+    async def _acquire(limiter: AdaptiveLimiter, deadline: float):
+        try:
+            await limiter.acquire(timeout=max(deadline - time.monotonic(), 0))
+        except LimiterSaturated as e:
+            raise LLMOverloadedError(f"LLM backend is saturated: {e}") from None
+
+    async def _backoff(self, attempt: int, deadline: float):
+        self.counts["retries"] += 1
+        delay = self.retry_backoff * 2 ** attempt * (0.5 + random.random())
+        if time.monotonic() + delay > deadline:
+            raise LLMOverloadedError("LLM backend did not recover before the deadline")
+        await asyncio.sleep(delay)
+
+    async def get_response(
+        self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing
+    ):
+        args = (system_instructions, input, model_settings, tools, output_schema, handoffs, tracing)
+        self.counts["calls"] += 1
+        if not self.coalesce:
+            return await self._get_response(*args)
+        key = self._key(False, *args[:6])
+        call = self._inflight.get(key)
+        if call is not None:
+            self.counts["coalesced"] += 1
+        else:
+            call = _SharedCall(self._inflight, key).start(self._get_response(*args))
+        call.join()
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.leave()
+
+    async def _get_response(self, *args):
+        deadline = time.monotonic() + self.queue_timeout
+        attempt = 0
+        while True:
+            model, limiter = await self._slot(deadline)
+            started = time.monotonic()
+            try:
+                response = await model.get_response(*args)
+            except Exception as e:
+                limiter.release(overloaded=_overloaded(e))
+                if not _retryable(e) or attempt >= self.max_retries:
+                    raise
+                await self._backoff(attempt, deadline)
+                attempt += 1
+                continue
+            except BaseException:
+                limiter.release()
+                raise
+            limiter.release(time.monotonic() - started)
+            return response
+
+    async def stream_response(
+        self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing
+    ):
+        args = (system_instructions, input, model_settings, tools, output_schema, handoffs, tracing)
+        self.counts["calls"] += 1
+        if not self.coalesce:
+            async for event in self._stream_response(*args):
+                yield event
+            return
+        key = self._key(True, *args[:6])
+        broadcast = self._inflight.get(key)
+        if broadcast is not None:
+            self.counts["coalesced"] += 1
+        else:
+            broadcast = _Broadcast(self._inflight, key)
+            broadcast.start(self._publish(broadcast, args))
+        async for event in broadcast.follow():
+            yield event
+
+    async def _publish(self, broadcast: _Broadcast, args: tuple):
+        try:
+            async for event in self._stream_response(*args):
+                broadcast.publish(event)
+            broadcast.publish(done=True)
+        except Exception as e:
+            broadcast.publish(done=True, error=e)
+
+    async def _stream_response(self, *args):
+        deadline = time.monotonic() + self.queue_timeout
+        attempt = 0
+        while True:
+            model, limiter = await self._slot(deadline)
+            started = time.monotonic()
+            first_event = None
+            try:
+                async for event in model.stream_response(*args):
+                    if first_event is None:
+                        # time to first event is the latency signal, the rest depends on output length
+                        first_event = time.monotonic() - started
+                    yield event
+            except Exception as e:
+                limiter.release(overloaded=_overloaded(e))
+                # once events went out the call cannot be replayed transparently
+                if first_event is not None or not _retryable(e) or attempt >= self.max_retries:
+                    raise
+                await self._backoff(attempt, deadline)
+                attempt += 1
+                continue
+            except BaseException:
+                limiter.release()
+                raise
+            limiter.release(first_event)
+            return
+
+    def stats(self) -> dict:
+        return {**self.counts, "primary": self.limiter.stats(), "fallback": self.fallback_limiter.stats()}
@@ -0,0 +1,154 @@
+import json
+import math
+import threading
+from collections import Counter
+import numpy as np
+from config import config
+from keyword_index import tokenize
+
+# Labelled utterances per route; the labels match agent_def.routes.
+ROUTE_EXAMPLES = {
+    "faq": [
+        "What is the baggage allowance?",
+        "How much luggage can I bring?",
+        "Can I bring my pet on board?",
+        "Do infants need their own ticket?",
+        "What happens if my flight is delayed?",
+        "What is your refund policy?",
+        "How early should I check in?",
+        "Which documents do I need for international travel?",
+        "Do you offer wifi on board?",
+        "What are the fees for extra bags?",
+        "Can I cancel my ticket and get a refund?",
+        "Is there compensation for a cancelled flight?",
+        "What payment methods do you accept?",
+        "How do I report lost luggage?",
+        "Are meals included on long haul flights?",
+        "What is the policy for unaccompanied minors?",
+    ],
+    "flight_search": [
+        "Find flights from London to Paris",
+        "Are there any flights from New York to Tokyo?",
+        "Show me flights between Dubai and Sydney",
+        "I want to fly from Berlin to Rome",
+        "Which flights go from Madrid to Lisbon?",
+        "Search for a flight to Singapore from Mumbai",
+        "When is the next flight from Oslo to Stockholm?",
+        "List available flights from Chicago to Toronto",
+        "What flights are there tomorrow from Seoul to Beijing?",
+        "I need to travel from Cairo to Istanbul",
+    ],
+    "flight_booking": [
+        "Book flight FL1234 for Jon Doe",
+        "I want to book a seat on flight FL5678",
+        "Reserve two seats on FL4321",
+        "Please book this flight for me",
+        "Change my seat to 12B",
+        "I would like a different seat on my booking",
+        "Update the seat for confirmation CONF1234",
+        "Can I switch to a window seat?",
+        "Add another seat to my booking",
+        "Make a reservation on flight FL9999 for Jane Smith",
+    ],
+}
+
+
+class IntentRouter:
+    """
+    Nearest-centroid classifier that picks a specialist agent for a first message.
+
+    In "keyword" mode each route is represented by the mean tf-idf vector of its
+    example utterances; in "embedding" mode by the mean of their embeddings.
+    `route` returns a label only when the best centroid is at least `threshold`
+    similar to the message and leads the runner-up by `margin`, otherwise None
+    so the caller falls back to the LLM triage agent.
+    """
+
+    def __init__(self, examples: dict, mode: str = "keyword", embeddings=None, threshold: float = None, margin: float = None):
+        self.mode = mode
+        self.embeddings = embeddings
+        self.threshold = threshold if threshold is not None else (0.5 if mode == "embedding" else 0.25)
+        self.margin = margin if margin is not None else (0.05 if mode == "embedding" else 0.1)
+        self.labels = list(examples)
+        if mode == "embedding":
+            self.centroids = np.stack(
+                [self._unit(np.mean(self.embeddings.embed_documents(examples[label]), axis=0)) for label in self.labels]
+            )
+        else:
+            documents = [tokenize(text) for label in self.labels for text in examples[label]]
+            document_frequency = Counter(term for tokens in documents for term in set(tokens))
+            self.vocabulary = {term: i for i, term in enumerate(sorted(document_frequency))}
+            self.idf = np.array(
+                [math.log((1 + len(documents)) / (1 + document_frequency[term])) + 1 for term in sorted(document_frequency)]
+            )
+            self.centroids = np.stack(
+                [
+                    self._unit(np.mean([self._tfidf(tokenize(text)) for text in examples[label]], axis=0))
+                    for label in self.labels
+                ]
+            )
+
+    @staticmethod
+    def _unit(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _tfidf(self, tokens):
+        vector = np.zeros(len(self.vocabulary))
+        for term, count in Counter(tokens).items():
+            if term in self.vocabulary:
+                vector[self.vocabulary[term]] = count
+        return self._unit(vector * self.idf)
+
+    def scores(self, text: str) -> dict:
+        if self.mode == "embedding":
+            query = self._unit(self.embeddings.embed_query(text))
+        else:
+            query = self._tfidf(tokenize(text))
+        return dict(zip(self.labels, (self.centroids @ query).tolist()))
+
+    def route(self, text: str):
+        ranked = sorted(self.scores(text).items(), key=lambda item: item[1], reverse=True)
+        label, best = ranked[0]
+        # with a single label there is nothing to be confused with, the margin always holds
+        runner_up = ranked[1][1] if len(ranked) > 1 else float("-inf")
+        if best >= self.threshold and best - runner_up >= self.margin:
+            return label
+        return None
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_router():
+    """Shared IntentRouter for ROUTER_MODE (keyword or embedding), or None when routing is off."""
+    global _router
+    mode = config.get("ROUTER_MODE", "off").lower()
+    if mode not in ("keyword", "embedding"):
+        return None
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                examples = ROUTE_EXAMPLES
+                if config.get("ROUTER_EXAMPLES_PATH"):
+                    with open(config.get("ROUTER_EXAMPLES_PATH"), encoding="utf-8") as f:
+                        examples = json.load(f)
+                    # the agents are only needed for this check, keep importing the router cheap
+                    from agent_def import routes
+                    unknown = sorted(set(examples) - set(routes))
+                    if unknown:
+                        raise ValueError(
+                            f"ROUTER_EXAMPLES_PATH has labels {unknown} that are not routes, choose from {sorted(routes)}"
+                        )
+                threshold = config.get("ROUTER_THRESHOLD")
+                margin = config.get("ROUTER_MARGIN")
+                _router = IntentRouter(
+                    examples,
+                    mode=mode,
+                    embeddings=config.embeddings if mode == "embedding" else None,
+                    threshold=float(threshold) if threshold else None,
+                    margin=float(margin) if margin else None,
+                )
+    return _router
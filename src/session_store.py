@@ -0,0 +1,51 @@
+import importlib
+from abc import ABC, abstractmethod
+from cache import TTLCache
+from config import config
+from conversation import ChatSession
+
+
+class SessionStore(ABC):
+    """
+    Where the gateway keeps conversations between turns.
+
+    Stores that live outside the process (Redis, a database) should persist
+    `ChatSession.to_dict()` and rebuild with `ChatSession.from_dict()`.
+    """
+
+    @abstractmethod
+    async def get(self, session_id: str) -> ChatSession | None: ...
+
+    @abstractmethod
+    async def save(self, session: ChatSession): ...
+
+    @abstractmethod
+    async def delete(self, session_id: str): ...
+
+
+class InMemorySessionStore(SessionStore):
+    """Process-local store; idle sessions expire after `ttl` seconds and the oldest are evicted first."""
+
+    def __init__(self, max_sessions: int = 10_000, ttl: float = 3600):
+        self._sessions = TTLCache(max_entries=max_sessions, ttl=ttl)
+
+    async def get(self, session_id: str) -> ChatSession | None:
+        return self._sessions.get(session_id)
+
+    async def save(self, session: ChatSession):
+        self._sessions.set(session.session_id, session)
+
+    async def delete(self, session_id: str):
+        self._sessions.pop(session_id)
+
+
+def create_session_store() -> SessionStore:
+    """Store selected by SESSION_STORE: "memory" or a "module:Class" path to a SessionStore."""
+    name = config.get("SESSION_STORE", "memory")
+    if name == "memory":
+        return InMemorySessionStore(
+            max_sessions=int(config.get("SESSION_MAX", 10_000)),
+            ttl=float(config.get("SESSION_TTL", 3600)),
+        )
+    module_name, class_name = name.split(":")
+    return getattr(importlib.import_module(module_name), class_name)()
@@ -0,0 +1,89 @@
+import importlib
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# phase name -> seconds, only the first measurement of a phase is kept so that
+# Streamlit reruns (which hit already imported modules) do not overwrite it
+timings = {}
+
+
+@contextmanager
+def timed(phase: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.setdefault(phase, time.perf_counter() - start)
+
+
+with timed("import config"):
+    from config import config
+
+_warmup_thread = None
+_warmup_lock = threading.Lock()
+
+
+def warmup(background: bool = True) -> threading.Thread:
+    """
+    Build the LLM client, model, embeddings and FAQ index ahead of the first message.
+
+    Safe to call on every Streamlit rerun: the work runs once per process.
+    """
+    global _warmup_thread
+    with _warmup_lock:
+        if _warmup_thread is None:
+            _warmup_thread = threading.Thread(target=_warmup, name="warmup", daemon=True)
+            _warmup_thread.start()
+    if not background:
+        _warmup_thread.join()
+    return _warmup_thread
+
+
+def _warmup():
+    from model import model
+    if config.model_mode != "replay":
+        with timed("warmup llm client"):
+            config.llm_client
+    with timed("warmup model"):
+        model.resolve()
+    with timed("warmup embeddings"):
+        config.embeddings
+    with timed("warmup router"):
+        from router import get_router
+        get_router()
+    with timed("warmup import chroma"):
+        import chroma
+    with timed("warmup chroma client"):
+        chroma.get_client()
+    print(report())
+
+
+def import_seconds() -> float:
+    return sum(seconds for phase, seconds in timings.items() if phase.startswith("import "))
+
+
+def over_budget() -> bool:
+    budget = float(config.get("STARTUP_BUDGET_SECONDS", 0) or 0)
+    return bool(budget) and import_seconds() > budget
+
+
+def report() -> str:
+    lines = [f"{phase:<28}{seconds * 1000:>10.1f} ms" for phase, seconds in timings.items()]
+    lines.append(f"{'imports total':<28}{import_seconds() * 1000:>10.1f} ms")
+    budget = float(config.get("STARTUP_BUDGET_SECONDS", 0) or 0)
+    if budget:
+        lines.append(
+            f"startup budget {budget * 1000:.0f} ms {'EXCEEDED' if over_budget() else 'ok'}"
+        )
+    return "Startup timings\n" + "\n".join(lines)
+
+
+if __name__ == "__main__":
+    # time each app module in import order, then the warmup, and fail when over budget
+    for module in ("model", "tools", "agent_def"):
+        with timed(f"import {module}"):
+            importlib.import_module(module)
+    warmup(background=False)
+    sys.exit(1 if over_budget() else 0)
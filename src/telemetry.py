@@ -0,0 +1,310 @@
+import bisect
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from agents import TracingProcessor, add_trace_processor, custom_span
+from agents.tracing import get_current_trace
+from config import config
+
+# seconds, tuned for calls between a cache hit and a slow LLM completion
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Histogram:
+    """Prometheus histogram with labels, rendered in the text exposition format."""
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        with self._lock:
+            series = self._series.setdefault(labels, [0] * len(self.buckets) + [0.0, 0])
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le=bound)} {cumulative}")
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le='+Inf')} {series[-1]}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {series[-2]}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {series[-1]}")
+        return lines
+
+
+class Counter:
+    """Prometheus counter with labels."""
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] += amount
+
+    def values(self) -> dict:
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+def _labels(names: tuple, values: tuple, **extra) -> str:
+    pairs = list(zip(names, values)) + list(extra.items())
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+span_seconds = Histogram(
+    "oagent_span_seconds", "Duration of LLM, tool, embedding, Chroma, HTTP, agent and handoff spans.", ("kind", "name")
+)
+span_errors = Counter("oagent_span_errors_total", "Spans that ended with an error.", ("kind", "name"))
+turn_seconds = Histogram("oagent_turn_seconds", "Wall time of one traced agent run.", ("workflow",))
+turn_attributed_seconds = Counter(
+    "oagent_turn_attributed_seconds_total",
+    "Turn wall time by where it was spent, each span counted without its children.",
+    ("kind",),
+)
+slow_turns = Counter("oagent_slow_turns_total", "Turns slower than SLOW_TURN_SECONDS.", ("workflow",))
+metrics = [span_seconds, span_errors, turn_seconds, turn_attributed_seconds, slow_turns]
+
+
+def render_metrics() -> str:
+    return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+def observe(kind: str, name: str, seconds: float, error: bool = False):
+    span_seconds.observe(seconds, kind, name)
+    if error:
+        span_errors.inc(kind, name)
+
+
+@contextmanager
+def span(kind: str, name: str):
+    """
+    Time work the Agents SDK does not trace itself (embedding, chroma and http).
+
+    The duration always goes to the metrics; inside a traced turn the work also
+    shows up as a span in the slow-turn log.
+    """
+    trace_span = custom_span(f"{kind}: {name}", {"kind": kind, "name": name}) if get_current_trace() else None
+    if trace_span is not None:
+        trace_span.start(mark_as_current=True)
+    started = time.perf_counter()
+    error = False
+    try:
+        yield
+    except Exception as e:
+        error = True
+        if trace_span is not None:
+            trace_span.set_error({"message": f"{type(e).__name__}: {e}", "data": None})
+        raise
+    finally:
+        observe(kind, name, time.perf_counter() - started, error)
+        if trace_span is not None:
+            trace_span.finish(reset_current=True)
+
+
+class LatencyTraceProcessor(TracingProcessor):
+    """
+    Attributes the wall time of each traced turn to LLM, tool, embedding, Chroma and HTTP work.
+
+    SDK spans feed the span histograms, every span is kept until its trace ends, and
+    turns slower than `slow_turn_seconds` are kept in a rolling log with their span tree.
+    """
+
+    SDK_KINDS = {"generation": "llm", "response": "llm", "function": "tool", "agent": "agent", "handoff": "handoff"}
+
+    def __init__(self, slow_turn_seconds: float = 10, slow_turn_log_size: int = 50, slow_turn_log_path: str = None):
+        self.slow_turn_seconds = slow_turn_seconds
+        self.slow_turn_log_path = slow_turn_log_path
+        self.slow_turn_log = deque(maxlen=slow_turn_log_size)
+        self._traces = {}  # trace_id -> (started_at, spans)
+        self._lock = threading.Lock()
+
+    def on_trace_start(self, trace):
+        with self._lock:
+            self._traces[trace.trace_id] = (time.time(), [])
+
+    def on_span_start(self, span):
+        pass
+
+    def on_span_end(self, span):
+        data = span.span_data
+        if data.type == "custom":
+            kind, name = data.data.get("kind", "custom"), data.data.get("name", data.name)
+        else:
+            kind = self.SDK_KINDS.get(data.type, data.type)
+            name = getattr(data, "name", None) or getattr(data, "model", None) or ""
+            if data.type == "handoff":
+                name = f"{data.from_agent} -> {data.to_agent}"
+        started, ended = _timestamp(span.started_at), _timestamp(span.ended_at)
+        if started is None or ended is None:
+            return
+        if data.type != "custom":
+            # custom spans were already measured by span() above
+            observe(kind, str(name), ended - started, span.error is not None)
+        with self._lock:
+            entry = self._traces.get(span.trace_id)
+            if entry is not None:
+                entry[1].append({
+                    "id": span.span_id,
+                    "parent": span.parent_id,
+                    "kind": kind,
+                    "name": str(name),
+                    "start": started,
+                    "end": ended,
+                    "error": span.error["message"] if span.error else None,
+                })
+
+    def on_trace_end(self, trace):
+        with self._lock:
+            entry = self._traces.pop(trace.trace_id, None)
+        if entry is None:
+            return
+        started, spans = entry
+        seconds = time.time() - started
+        exported = trace.export() or {}
+        workflow = exported.get("workflow_name", "")
+        turn_seconds.observe(seconds, workflow)
+        breakdown = attribute(spans, seconds)
+        for kind, kind_seconds in breakdown.items():
+            turn_attributed_seconds.inc(kind, amount=kind_seconds)
+        if seconds >= self.slow_turn_seconds:
+            slow_turns.inc(workflow)
+            record = {
+                "trace_id": trace.trace_id,
+                "workflow": workflow,
+                "group_id": exported.get("group_id"),
+                "started_at": datetime.fromtimestamp(started).isoformat(timespec="milliseconds"),
+                "seconds": round(seconds, 3),
+                "breakdown": {kind: round(value, 3) for kind, value in breakdown.items()},
+                "spans": span_tree(spans, started),
+            }
+            self.slow_turn_log.append(record)
+            print(f"Slow turn {trace.trace_id} {seconds:.2f}s: {record['breakdown']}")
+            if self.slow_turn_log_path:
+                with open(self.slow_turn_log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record) + "\n")
+
+    def shutdown(self):
+        pass
+
+    def force_flush(self):
+        pass
+
+
+def _timestamp(value: str | None) -> float | None:
+    return datetime.fromisoformat(value).timestamp() if value else None
+
+
+def attribute(spans: list[dict], total: float) -> dict:
+    """
+    Split a turn's wall time by span kind, counting each span without its children.
+
+    Agent spans keep only the time not spent in LLM, tool or other child spans, which
+    is the orchestration overhead; time outside any span is reported as "other".
+    """
+    children = defaultdict(float)
+    for s in spans:
+        children[s["parent"]] += s["end"] - s["start"]
+    breakdown = defaultdict(float)
+    for s in spans:
+        breakdown[s["kind"]] += max(s["end"] - s["start"] - children[s["id"]], 0.0)
+    breakdown["other"] = max(total - sum(s["end"] - s["start"] for s in spans if s["parent"] is None), 0.0)
+    return dict(breakdown)
+
+
+def span_tree(spans: list[dict], started: float) -> list[dict]:
+    """Nested spans with offsets in ms from the start of the turn."""
+    nodes = {
+        s["id"]: {
+            "kind": s["kind"],
+            "name": s["name"],
+            "offset_ms": round((s["start"] - started) * 1000, 1),
+            "ms": round((s["end"] - s["start"]) * 1000, 1),
+            **({"error": s["error"]} if s["error"] else {}),
+            "children": [],
+        }
+        for s in sorted(spans, key=lambda s: s["start"])
+    }
+    roots = []
+    for s in sorted(spans, key=lambda s: s["start"]):
+        parent = nodes.get(s["parent"])
+        (parent["children"] if parent else roots).append(nodes[s["id"]])
+    return roots
+
+
+processor = LatencyTraceProcessor(
+    slow_turn_seconds=float(config.get("SLOW_TURN_SECONDS", 10)),
+    slow_turn_log_size=int(config.get("SLOW_TURN_LOG_SIZE", 50)),
+    slow_turn_log_path=config.get("SLOW_TURN_LOG_PATH"),
+)
+_installed = False
+_install_lock = threading.Lock()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/metrics":
+            body, content_type = render_metrics().encode(), "text/plain; version=0.0.4"
+        elif self.path == "/slow-turns":
+            body, content_type = json.dumps(list(processor.slow_turn_log)).encode(), "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def install(serve: bool = True):
+    """
+    Register the trace processor next to the default exporters, once per process.
+
+    With METRICS_PORT set and `serve` true, /metrics and /slow-turns are served from a
+    background thread; the gateway serves the same routes itself.
+    """
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        _installed = True
+        add_trace_processor(processor)
+        port = int(config.get("METRICS_PORT", 0) or 0)
+        if serve and port:
+            server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+            threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+            print(f"Serving metrics on :{port}/metrics")
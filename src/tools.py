@@ -1,14 +1,15 @@
+import asyncio
 import random
-import requests
 from agents import function_tool, RunContextWrapper
 from model import AirlineAgentContext
 from itertools import product
-from chroma import client as chroma_client
+from http_client import flight_server
+from flight_cache import flight_search_cache
 
 
 @function_tool(
     name_override="find_available_flights",
-    description_override="List all flights between two cities.",
+    description_override="List all flights between two cities, or connecting flights when there is no direct one.",
 )
 async def find_available_flights(
     context: RunContextWrapper[AirlineAgentContext], from_city: str, to_city: str
@@ -18,13 +19,12 @@ async def find_available_flights(
     """
     # get the flights available by requesting the endpoint /flights?from_city=...&to_city=...
     try:
-        flights = requests.get(
-            "http://flight_server:8000/flights/search",
-            params={"from_city": from_city, "to_city": to_city},
-        ).json()
+        flights = await flight_search_cache.search_route(from_city, to_city)
 
         context.context.from_city = from_city
         context.context.to_city = to_city
+        if not flights:
+            return await _find_connecting_flights(from_city, to_city)
         return "\n".join(
             [
                 f"Flight {s.get('flight_number')} - departing at {s.get('departing_time')}"
@@ -36,12 +36,31 @@ async def find_available_flights(
         return f"Error: {e}"
 
 
+async def _find_connecting_flights(from_city: str, to_city: str) -> str:
+    """Itineraries with connections from /flights/itineraries, each leg is booked on its own."""
+    response = await flight_server.get(
+        "/flights/itineraries", params={"from_city": from_city, "to_city": to_city}
+    )
+    response.raise_for_status()
+    itineraries = response.json()
+    if not itineraries:
+        return f"No flights found from {from_city} to {to_city}"
+    lines = [f"No direct flights from {from_city} to {to_city}, connecting options:"]
+    for i, itinerary in enumerate(itineraries, 1):
+        legs = ", then ".join(
+            f"Flight {leg['flight_number']} {leg['departure_city']} -> {leg['arrival_city']} departing at {leg['departing_time']}"
+            for leg in itinerary["legs"]
+        )
+        lines.append(f"Option {i}: {legs}; arriving at {itinerary['arrival_time']}")
+    return "\n".join(lines)
+
+
 @function_tool(
     name_override="faq_lookup_tool",
     description_override="Lookup frequently asked questions.",
 )
 async def faq_lookup_tool(question: str) -> str:
-    result = chroma_client.similarity_search(question)
+    result = await asyncio.to_thread(_faq_search, question)
 
     return "FAQ result\n" + result
 
@@ -59,14 +78,6 @@ async def book_flight_seat(
     """
     Book a new flight given from and to cities and return flight confirmation
     """
-    # get the response content as list
-    flights = requests.get(
-        f"http://flight_server:8000/bookings/book",
-        params={"flight_number": flight_number,
-                "passenger_name": passenger_name,
-                "no_of_seats": no_of_seats},
-    ).json()
-
     assert passenger_name is not None, "Please provide the passenger name"
     assert context.context.from_city is not None, (
         "Please find flights using flight search agent"
@@ -74,14 +85,17 @@ async def book_flight_seat(
     assert context.context.to_city is not None, (
         "Please find flights using flight search agent"
     )
+    # get the response content as list
+    flights = await flight_search_cache.search_route(context.context.from_city, context.context.to_city)
+
     assert flight_number in [s.get("flight_number") for s in flights], (
-        f"Flight {flight_number} does not exist. Available flights are {find_available_flights(from_city=context.context.from_city, to_city=context.context.to_city)}"
+        f"Flight {flight_number} does not exist. Available flights are {', '.join(s.get('flight_number') for s in flights)}"
     )
     context.context.passenger_name = passenger_name
     context.context.flight_number = flight_number
 
-    response = requests.post(
-        f"http://flight_server:8000/bookings/book",
+    response = await flight_server.post(
+        "/bookings/book",
         params={
             "flight_number": flight_number,
             "passenger_name": passenger_name,
@@ -92,6 +106,7 @@ async def book_flight_seat(
     if response.status_code != 200:
         return response.json().get("detail")
 
+    flight_search_cache.invalidate_flight(flight_number)
     booking_data = response.json()
     context.context.seat_numbers = booking_data.get("seat_numbers")
     context.context.confirmation_number = booking_data.get(
@@ -121,23 +136,38 @@ async def update_flight_seat(
         f"Booking confirmation {confirmation_number} does not exist, Please try again."
     )
 
+    # Ensure that the flight number has been set by the incoming handoff
+    assert context.context.flight_number is not None, "Flight number is required"
     availabe_seats = (
-        requests.get(
-            f"http://flight_server:8000/flights?flight_number={context.context.flight_number}"
-        )
-        .json()[0]
+        (await flight_search_cache.search_flight(context.context.flight_number))[0]
         .get("available_seats")
     )
 
     assert new_seat in availabe_seats, f"Only seats {availabe_seats} are available"
+    current_seat = context.context.seat_number or (context.context.seat_numbers or [None])[0]
+    response = await flight_server.put(
+        "/bookings/amend",
+        params={
+            "confirmation_number": confirmation_number,
+            "seat_number_from": current_seat,
+            "seat_number_to": new_seat,
+        },
+    )
+    if response.status_code != 200:
+        return response.json().get("detail")
+
+    flight_search_cache.invalidate_flight(context.context.flight_number)
     context.context.seat_number = new_seat
-    # Ensure that the flight number has been set by the incoming handoff
-    assert context.context.flight_number is not None, "Flight number is required"
-    response = requests.put(
-        f"http://flight_server:8000/bookings/amend/{context.context.flight_number}",)
+    context.context.seat_numbers = response.json().get("seat_numbers")
     return f"Updated seat to {new_seat} for confirmation number {confirmation_number}"
 
 
+def _faq_search(question: str) -> str:
+    # chroma pulls in chromadb and may reindex, so it is only loaded on the first lookup or warmup
+    from chroma import get_client
+    return get_client().similarity_search(question)
+
+
 # HOOKS
 
 
@@ -0,0 +1,26 @@
+import time
+
+
+class TurnMetrics:
+    """Wall-clock milestones of one chat turn, measured from when the user message arrives."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.marks = {}
+
+    def mark(self, name: str):
+        """Record the first occurrence of a milestone such as "first_token" or "first_tool_call"."""
+        self.marks.setdefault(name, time.perf_counter() - self.started)
+
+    def finish(self) -> dict:
+        self.mark("total")
+        print(f"Turn metrics: { {name: round(seconds, 3) for name, seconds in self.marks.items()} }")
+        return dict(self.marks)
+
+    def summary(self) -> str:
+        return summarize(self.marks)
+
+
+def summarize(marks: dict) -> str:
+    labels = {"first_token": "first token", "first_tool_call": "first tool call", "total": "total"}
+    return " · ".join(f"{label} {marks[name]:.2f}s" for name, label in labels.items() if name in marks)